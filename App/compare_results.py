@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+
+from testing.results import ResultStore, RESULTS_PATH, compareRuns
+
+run_ids = None
+results_file = RESULTS_PATH
+output = None
+
+argumentList = sys.argv[1:]
+arguments_num = len(argumentList)
+
+for i in range(arguments_num):
+    currentArgument = argumentList[i]
+
+    if(arguments_num == 1 and currentArgument in ("-h", "--Help")):
+        print("Script compares test runs from the results file in a markdown table. Deltas are relative to the first run.\n"+
+            " -r  --Runs        Comma separated run ids. Default are the last two runs.\n"+
+            " -f  --File        Specify path for the JSONL results file. Default is App/results/results.jsonl.\n"+
+            " -o  --Output      Write the table to a file instead of printing it. ")
+
+        exit()
+
+    elif(i % 2 == 0):
+        currentValue = argumentList[i+1]
+        if(currentArgument in ("-r", "--Runs")):
+            run_ids = currentValue.split(",")
+        elif(currentArgument in ("-f", "--File")):
+            results_file = currentValue
+        elif(currentArgument in ("-o", "--Output")):
+            output = currentValue
+
+store = ResultStore(results_file)
+if(run_ids == None):
+    run_ids = store.runIds()[-2:]
+
+if(len(run_ids) == 0):
+    print("Error no runs found in {}".format(results_file))
+else:
+    table = compareRuns(store, run_ids)
+    if(output != None):
+        with open(output, 'w', encoding='utf-8') as output_file:
+            output_file.write(table + "\n")
+        print("Comparison in: {}".format(output))
+    else:
+        print(table)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+from testing.corpus_generator import CorpusGenerator
+from testing.test_utils import Progress
+
+docs = 10000
+output = None
+format = None
+mean_words = 200
+distribution = "lognormal"
+sigma = 1.0
+vocabulary = 50000
+vocabulary_file = None
+zipf = 1.1
+oversized = 0.0
+seed = None
+
+argumentList = sys.argv[1:]
+arguments_num = len(argumentList)
+
+for i in range(arguments_num):
+    currentArgument = argumentList[i]
+
+    if(arguments_num == 1 and currentArgument in ("-h", "--Help")):
+        print("Script generates a synthetic corpus in the CSV or JSON format of the test corpora. Documents are streamed to the file.\n"+
+            " -o  --Output         Path of the generated corpus.\n"+
+            " -F  --Format         Corpus format, default by the output extension. [CSV/JSON]\n"+
+            " -n  --Docs           Number of documents. Default is 10000.\n"+
+            " -l  --Length         Mean document length in words. Default is 200.\n"+
+            " -L  --Distribution   Document length distribution. Default is lognormal. [lognormal/uniform/fixed]\n"+
+            " -g  --Sigma          Sigma of the lognormal length distribution. Default is 1.0.\n"+
+            " -v  --Vocabulary     Number of synthetic words. Default is 50000.\n"+
+            " -V  --VocabularyFile File of words, one per line from the most frequent, used instead of synthetic words.\n"+
+            " -z  --Zipf           Exponent of the Zipf word frequency distribution. Default is 1.1.\n"+
+            " -O  --Oversized      Share of documents larger than the Lucene term limit. Default is 0.\n"+
+            " -S  --Seed           Random seed, the same seed and options generate the same corpus. ")
+
+        exit()
+
+    elif(i % 2 == 0):
+        currentValue = argumentList[i+1]
+        if(currentArgument in ("-o", "--Output")):
+            output = currentValue
+        elif(currentArgument in ("-F", "--Format")):
+            format = currentValue.upper()
+        elif(currentArgument in ("-n", "--Docs") and currentValue.isnumeric()):
+            docs = int(currentValue)
+        elif(currentArgument in ("-l", "--Length") and currentValue.isnumeric()):
+            mean_words = int(currentValue)
+        elif(currentArgument in ("-L", "--Distribution")):
+            distribution = currentValue.lower()
+        elif(currentArgument in ("-g", "--Sigma")):
+            sigma = float(currentValue)
+        elif(currentArgument in ("-v", "--Vocabulary") and currentValue.isnumeric()):
+            vocabulary = int(currentValue)
+        elif(currentArgument in ("-V", "--VocabularyFile")):
+            vocabulary_file = currentValue
+        elif(currentArgument in ("-z", "--Zipf")):
+            zipf = float(currentValue)
+        elif(currentArgument in ("-O", "--Oversized")):
+            oversized = float(currentValue)
+        elif(currentArgument in ("-S", "--Seed") and currentValue.isnumeric()):
+            seed = int(currentValue)
+
+if(format == None and output != None):
+    format = "JSON" if output.lower().endswith(".json") else "CSV"
+
+if(output == None):
+    print("Error output file must be given.\nExample: -o data/corpus/synthetic.csv -n 100000")
+elif(format not in ("CSV", "JSON")):
+    print("Error unknown format {}, use CSV or JSON".format(format))
+else:
+    generator = CorpusGenerator(docs, mean_words, distribution, sigma, vocabulary, zipf, vocabulary_file, oversized, seed)
+    print("-> generating {} documents".format(docs))
+    time_start = time.perf_counter()
+    generator.write(output, format, Progress(50))
+    print("Corpus in: {} Elapsed: {:.2f}s".format(output, time.perf_counter() - time_start))
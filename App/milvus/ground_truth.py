@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import glob
+import shutil
+import numpy as np
+
+CHUNK_ROWS = 65536 # Vectors compared at once, bounds memory of exact search
+
+# Embeddings inserted to a collection saved as chunks of ids and vectors,
+# used for exact k nearest neighbour search as ground truth for the ANN index
+class EmbeddingStore():
+    def __init__(self, directory, chunk_rows = CHUNK_ROWS):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+
+    def _chunks(self):
+        return sorted(glob.glob(os.path.join(self.directory, "*_ids.npy")))
+
+    def add(self, ids, embeddings):
+        if(not os.path.exists(self.directory)):
+            os.makedirs(self.directory)
+        chunk = os.path.join(self.directory, "{:06d}".format(len(self._chunks())))
+        np.save(chunk + "_vectors.npy", np.asarray(embeddings, dtype=np.float32))
+        np.save(chunk + "_ids.npy", np.asarray(ids, dtype=np.int64))
+
+    def clear(self):
+        if(os.path.exists(self.directory)):
+            shutil.rmtree(self.directory)
+
+    def isEmpty(self):
+        return len(self._chunks()) == 0
+
+    # Exact top k ids for each query row, sorted from nearest. Metric IP ranks by highest inner product, L2 by lowest distance
+    def search(self, queries, k, metric = "IP"):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        query_count = len(queries)
+        best_ids = np.empty((query_count, 0), dtype=np.int64)
+        best_scores = np.empty((query_count, 0), dtype=np.float32)
+
+        for ids_file in self._chunks():
+            chunk_ids = np.load(ids_file, mmap_mode="r")
+            chunk_vectors = np.load(ids_file.replace("_ids.npy", "_vectors.npy"), mmap_mode="r")
+
+            for start in range(0, len(chunk_ids), self.chunk_rows):
+                vectors = np.asarray(chunk_vectors[start:start+self.chunk_rows])
+                ids = np.asarray(chunk_ids[start:start+self.chunk_rows])
+                # Scores are ranked from lowest, squared norm of queries is constant per query and left out of L2
+                if(metric == "L2"):
+                    scores = np.einsum("ij,ij->i", vectors, vectors)[np.newaxis, :] - 2 * queries @ vectors.T
+                else:
+                    scores = -(queries @ vectors.T)
+
+                candidate_scores = np.concatenate([best_scores, scores], axis=1)
+                candidate_ids = np.concatenate([best_ids, np.broadcast_to(ids, (query_count, len(ids)))], axis=1)
+                if(candidate_scores.shape[1] > k):
+                    top = np.argpartition(candidate_scores, k-1, axis=1)[:, :k]
+                    candidate_scores = np.take_along_axis(candidate_scores, top, axis=1)
+                    candidate_ids = np.take_along_axis(candidate_ids, top, axis=1)
+                best_scores, best_ids = candidate_scores, candidate_ids
+
+        order = np.argsort(best_scores, axis=1)
+
+        return np.take_along_axis(best_ids, order, axis=1)
+
+# Share of exact nearest neighbours found by the approximate search
+def recallAtK(approximate_ids, exact_ids):
+    exact = set(int(id) for id in exact_ids)
+    if(len(exact) == 0):
+        return None
+
+    return len(exact.intersection(int(id) for id in approximate_ids)) / len(exact)
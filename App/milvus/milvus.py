@@ -3,19 +3,23 @@
 import logging
 from pymilvus import Collection, CollectionSchema, FieldSchema, DataType, connections, utility
 from sentence_transformers import SentenceTransformer
-import pandas as pd
 from sklearn.preprocessing import normalize
 import psycopg2
 import sys
 import os 
 import re
 import json
+import time
 
 from numba import jit, cuda
+from milvus.ground_truth import EmbeddingStore
+from testing.batching import (BatchSizer, sizedBatches, BATCH_BYTES, BATCH_MAX_DOCS)
+from testing.corpus_cache import openCorpus
 
 LOG = logging.getLogger("_milvus_")
 
 MODELS_PATH = os.path.dirname(os.path.realpath(__file__)) + "/models/"
+EMBEDDINGS_PATH = os.path.dirname(os.path.realpath(__file__)) + "/embeddings/"
 
 TABLE_NAME = "texts"
 TITLE_COLLECTION = "title_collection"
@@ -27,11 +31,11 @@ PRIMARY_COLUMN = "id"
 TITLE_COLUMN = "title"
 TEXT_COLUMN = "text"
 INSERT_TRY = 3
-TITLE_PARTITION_PROCENT = 0.1 # Partition size 10%
 SENTENCE_INSERT_LIMIT = 50000 # Sentence partition size for encoding
+SENTENCE_PATTERN = r'([A-Z][^\.!?]*[\.!?])'
 
 class Milvus:
-    def __init__(self, client, config):
+    def __init__(self, client, config, store_embeddings = False):
         self.log = self._get_log()
         self.host = client["milvus_host"]
         self.port = client["milvus_port"]
@@ -51,6 +55,17 @@ class Milvus:
 
         self.text_collection = None
         self.title_collection = None
+        # Inserted text embeddings saved for exact search, ground truth of recall tests. The store is cleared with the collections
+        # also when embeddings are not saved, so stale embeddings of an earlier index are never used as ground truth
+        self.embedding_store = EmbeddingStore(EMBEDDINGS_PATH + TEXT_COLLECTION)
+        self.store_embeddings = store_embeddings
+        # Title partitions are bounded by text bytes and docs, adaptive batching tunes the bytes by insert throughput
+        self.batch_bytes = config.get("batch_bytes", BATCH_BYTES)
+        self.batch_docs = config.get("batch_docs", BATCH_MAX_DOCS)
+        self.adaptive_batching = config.get("adaptive_batching", False)
+        # Adaptive partitions shrink when their insert requests take longer than the milliseconds
+        self.batch_max_latency = config.get("batch_max_latency")
+        self.insert_time = 0.0
 
         self._initClients()
 
@@ -63,6 +78,10 @@ class Milvus:
         self.index_build_params = index["build_params"]
         self.index_search_params = index["search_params"]
 
+    # Change search parameters of the index, used between query tests on the same indexed data
+    def setSearchParams(self, config):
+        self.index_search_params = config["index"]["search_params"]
+
     # Initialize Milvus and Postgres clients 
     def _initClients(self):
         self.log.info("    Initializing Milvus and Postgres clients {} {} {} {} ".format(self.host, self.port, self.dbhost, self.dbport))
@@ -150,7 +169,7 @@ class Milvus:
         return model
 
     # Encode sentences to vector space and insert vectors to collection
-    def _insertSentenceEmbeddings(self, model, do_normalize,collection, data_encode,  additional_data = None):
+    def _insertSentenceEmbeddings(self, model, do_normalize,collection, data_encode,  additional_data = None, store = None):
         self.log.info("    Embedding {}".format(len(data_encode)))
         sentence_embeddings = model.encode(sentences=data_encode, show_progress_bar=False)
 
@@ -159,6 +178,7 @@ class Milvus:
     
         self.log.info("    Indexing")
         retry = 0
+        result = None
         # Retry insert if Milvus server exception occurs
         while retry < INSERT_TRY:
             try:
@@ -170,17 +190,31 @@ class Milvus:
                         return None 
 
                     self.log.info("    Inserting titles ids and sentences")
-
-                    return collection.insert([list(sentence_embeddings), additional_data])
+                    result = self._timedInsert(collection, [list(sentence_embeddings), additional_data])
+                    break
     
                 self.log.info("    Inserting titles")
 
-                return collection.insert([list(sentence_embeddings)])
+                return self._timedInsert(collection, [list(sentence_embeddings)])
 
             except Exception as ex:
                 self.log.exception("    " + str(ex) )
                 retry += 1
+
+        # Saved once the insert succeeded, so a failed store does not retry an insert that is already in the collection
+        if(result != None and store != None):
+            store.add(result.primary_keys, sentence_embeddings)
+
+        return result
     
+    # Insert to collection, adding the request time to the insert time of the partition
+    def _timedInsert(self, collection, data):
+        time_start = time.perf_counter()
+        try:
+            return collection.insert(data)
+        finally:
+            self.insert_time += time.perf_counter() - time_start
+
     # Try to find sentences with pattern, then split them in chunks in size of sequence limit of a model
     def _tokenizeText(self, text_data, sequenceLimit, pattern):
         sentences = pattern.findall(text_data)
@@ -192,101 +226,72 @@ class Milvus:
 
         return split_sentences
     
-    # Insert data 
-    def _indexData(self, title_data, text_data, progress, use_partition):
-        title_count = len(title_data)
+    # Insert a partition of documents: title embeddings, sentence embeddings mapped to title ids and data base rows
+    def _insertPartition(self, partition):
+        title_data = [title for (title, _), _ in partition]
+        text_data = [text for (_, text), _ in partition]
+        # Retrieved object contains ids, which are used for mappig sentences to titles
+        self.log.info("    Inserting title sentence embeddings")
+        title_vector_collection = self._insertSentenceEmbeddings(self.title_model, self.title_model_config["normalize"], self.title_collection, title_data)
+
+        row_values = []
+        title_ids = []
+        tokenized_texts = []
+        for i in range(len(title_vector_collection.primary_keys)):
+            # Construct a data base row
+            row_values.append((title_vector_collection.primary_keys[i], title_data[i], text_data[i]))
+
+            tokenized_text = partition[i][1]
+            tokenized_texts += tokenized_text
+            title_ids += [title_vector_collection.primary_keys[i]] * len(tokenized_text)
+
+        # Partition sentences by insert limit
+        for p in range(0, len(tokenized_texts), SENTENCE_INSERT_LIMIT):
+            self.log.info("    Do sentence partition  {}/{} because of limit {} ".format(min(p + SENTENCE_INSERT_LIMIT, len(tokenized_texts)), len(tokenized_texts), SENTENCE_INSERT_LIMIT))
+            self._insertSentenceEmbeddings(self.text_model, self.text_model_config["normalize"], self.text_collection,
+                                           tokenized_texts[p:p+SENTENCE_INSERT_LIMIT], title_ids[p:p+SENTENCE_INSERT_LIMIT],
+                                           self.embedding_store if self.store_embeddings else None)
+
+        # Insert partition to data base
+        try:
+            self.log.info("    Inserting to db")                
+            args = ','.join(self.dbcursor.mogrify("(%s,%s,%s)", i).decode('utf-8') for i in row_values)
+            sql = "INSERT INTO " + TABLE_NAME + " VALUES " + (args)
+            time_start = time.perf_counter()
+            self.dbcursor.execute(sql)
+            self.dbconn.commit()
+            self.insert_time += time.perf_counter() - time_start
+        except Exception as ex:
+            self.log.exception("    Exception when inserting to db" + str(ex) )
+
+    # Insert data, docs are ((title, text), sentences) read lazily and inserted in partitions of titles, so only one partition is in memory
+    def _indexData(self, docs, title_count, progress):
         progress.setMax(title_count)
         progress.start()
 
+        # Partition by bytes of titles and texts, which bound the data base rows and the sentences to encode
+        sizer = BatchSizer(self.batch_bytes, self.batch_docs, self.adaptive_batching,
+                           self.batch_max_latency / 1000 if self.batch_max_latency != None else None)
+        self.log.info("    Partitioning titles {} by {}".format(title_count, sizer.describe()))
+        size = lambda doc: len(bytes(doc[0][0], 'utf-8')) + len(bytes(doc[0][1], 'utf-8'))
+
+        count = 0
+        for partition, partition_bytes in sizedBatches(docs, sizer, size):
+            count += len(partition)
+            self.log.info("    Do title partition: {}/{} ({} bytes)".format(count, title_count, partition_bytes))
+            # Only insert requests are observed, embedding the partition is client work that does not depend on the server
+            self.insert_time = 0.0
+            self._insertPartition(partition)
+            sizer.observe(len(partition), partition_bytes, self.insert_time)
+            progress.print(count)
+        self.batch_stats = sizer.stats()
+        if(self.adaptive_batching):
+            self.log.info("    Adaptive batch size ended at {} bytes after {} batches".format(sizer.target_bytes, sizer.batches))
 
-        if(use_partition):
-            row_values = [] 
-            title_ids = []
-            tokenized_texts = []
-            sentence_pattern = re.compile(r'([A-Z][^\.!?]*[\.!?])', re.M)
-
-            # Encode all titles to vectors at once
-            self.log.info("    Inserting title sentence embeddings")
-            # Retrieved object contains ids, which are used for mappig sentences to titles
-            title_vector_collection = self._insertSentenceEmbeddings(self.title_model, self.title_model_config["normalize"], self.title_collection, title_data)
-            self.title_collection.release()
-
-            # Calculate partition size by procentage and number of documents
-            partition_size = int(title_count * TITLE_PARTITION_PROCENT)
-            if(partition_size < 1 ):
-                partition_size = 1
-            self.log.info("    Partitioning titles {} by {} with partition size {}".format(title_count, TITLE_PARTITION_PROCENT, partition_size))
-
-            # Partiton titles by procent to insert to db
-            for i in range(len(title_vector_collection.primary_keys)):
-                # Construct a data base row
-                row_values.append((title_vector_collection.primary_keys[i], title_data[i], text_data[i]))
-
-                # Get tokenized text by finding sentences and spliting them to chunks for the model
-                tokenized_text = self._tokenizeText(text_data[i], self.text_model_config["max_sequence"], sentence_pattern)
-                tokenized_texts += tokenized_text
-                title_ids += [title_vector_collection.primary_keys[i]] * len(tokenized_text)
-
-                # Check if partition needs to be done
-                if((i > 0 and i % partition_size == 0 ) or i == title_count-1):
-                    self.log.info("    Do title partition: {}/{}".format(i+1, title_count))
-                    partitioned_tokenized_texts = []
-                    partitioned_title_ids = []
-                    # Partition sentences by insert limit
-                    for p in range(len(tokenized_texts)):
-                        partitioned_tokenized_texts.append(tokenized_texts[p])
-                        partitioned_title_ids.append(title_ids[p])
-
-                        # Check if partition needs to be done
-                        if((p > 0 and p % SENTENCE_INSERT_LIMIT == 0) or p == len(tokenized_texts)-1):
-                            self.log.info("    Do sentence partition  {}/{} because of limit {} ".format(p, len(tokenized_texts), SENTENCE_INSERT_LIMIT))
-                            self._insertSentenceEmbeddings(self.text_model, self.text_model_config["normalize"], self.text_collection, partitioned_tokenized_texts, partitioned_title_ids)  
-
-                            partitioned_tokenized_texts = []
-                            partitioned_title_ids = []
-
-                    # Insert partition to data base
-                    try:
-                        self.log.info("    Inserting to db")                
-                        args = ','.join(self.dbcursor.mogrify("(%s,%s,%s)", i).decode('utf-8') for i in row_values)
-                        sql = "INSERT INTO " + TABLE_NAME + " VALUES " + (args)
-                        self.dbcursor.execute(sql)
-                        self.dbconn.commit()
-                        progress.print(i+1)
-                    except Exception as ex:
-                        self.log.exception("    Exception when inserting to db" + str(ex) )
-                    finally:
-                        tokenized_texts = []
-                        title_ids = []
-                        row_values = []
-        
-        else:
-            # Encode all titles to vectors at once
-            self.log.info("    Inserting title sentence embeddings")
-            # Retrieved object contains ids, which are used for mappig sentences to titles
-            title_vector_collection = self._insertSentenceEmbeddings(self.title_model, self.title_model_config["normalize"], self.title_collection, title_data)
-
-            for i in range(len(title_vector_collection.primary_keys)):
-                row_values.append((title_vector_collection.primary_keys[i], title_data[i], text_data[i]))
-
-                sentences = sentence_pattern.findall(text_data[i])
-                tokenized_texts += sentences
-                title_ids += [title_vector_collection.primary_keys[i] * len(sentences)]
-
-            self.log.info("    Inserting text sentence embeddings")
-            self._insertSentenceEmbeddings(self.text_model, self.text_model_config["normalize"], self.text_collection, tokenized_texts, title_ids)  
-
-            try:
-                self.log.info("    Inserting to db")
-                args = ','.join(self.dbcursor.mogrify("(%s,%s,%s)", i).decode('utf-8') for i in row_values)
-                sql = "INSERT INTO " + TABLE_NAME + " VALUES " + (args)
-                self.dbcursor.execute(sql)
-                self.dbconn.commit()
-                progress.print(title_count)
-            except Exception as ex:
-                self.log.exception("    Exception when inserting to db" + str(ex) )
-        
+        self.title_collection.release()
         progress.end()
+
+        return count
         
     # Initialize data base table and vector collection
     def initServices(self):
@@ -294,32 +299,45 @@ class Milvus:
         self._initDatabase()     
 
     # Read and index documents from corpus
-    def indexDocuments(self, file, format, progress,  use_partition = False ): 
+    # Get tokenized text by finding sentences, with partitioning spliting them to chunks for the model.
+    # Returns the settings keying the compiled sentences and the tokenizer
+    def _sentenceTokenizer(self, use_partition):
+        sentence_pattern = re.compile(SENTENCE_PATTERN, re.M)
+        if(use_partition):
+            max_sequence = self.text_model_config["max_sequence"]
+            tokenize = lambda text: self._tokenizeText(text, max_sequence, sentence_pattern)
+        else:
+            max_sequence = None
+            tokenize = sentence_pattern.findall
+
+        return {"pattern": SENTENCE_PATTERN, "max_sequence": max_sequence}, tokenize
+
+    # Open the corpus to index before the index time is measured. A compiled corpus is compiled when missing
+    # and keeps the sentences of the tokenizer settings, so they are split only once and not while indexing
+    def prepareIndex(self, file, format, use_partition = False, cache = False):
+        corpus = openCorpus(file, format, cache)
+        corpus.compileSentences(*self._sentenceTokenizer(use_partition))
+
+        return corpus
+
+    # Index documents of the corpus, opened by prepareIndex when not given
+    def indexDocuments(self, file, format, progress,  use_partition = False, cache = False, corpus = None): 
         self.log.info("    Indexing documents: {} {}".format(file, format))
-        title_data = []
-        text_data = []
 
         if(self.title_collection == None):
             self.title_collection = self._getCollection(TITLE_COLLECTION) 
         if(self.text_collection == None):
             self.text_collection = self._getCollection(TEXT_COLLECTION) 
-        
-        if(format == "CSV" ):
-            data_not_filtered = pd.read_csv(file, keep_default_na=False)
-            data = data_not_filtered[['title', 'text']]
-            title_data = data['title'].tolist()
-            text_data = data['text'].tolist()
 
-            self._indexData(title_data, text_data, progress, use_partition)
-            
-        elif(format == "JSON"):
-            with open(file, 'r', encoding="utf-8") as json_file:
-                docs = json.load(json_file)
-                for doc in docs:
-                    title_data.append(doc)
-                    text_data.append(docs[doc])
-                
-                self._indexData(title_data, text_data, progress, use_partition)
+        # Saved embeddings no longer match the collection when documents are indexed without saving them
+        if(not self.store_embeddings):
+            self.embedding_store.clear()
+        if(corpus == None):
+            corpus = self.prepareIndex(file, format, use_partition, cache)
+        settings, tokenize = self._sentenceTokenizer(use_partition)
+        count = self._indexData(corpus.tokenized(settings, tokenize), len(corpus), progress)
+
+        return {"documents": count, **self.batch_stats}
 
     # Search title field
     def search(self, query):
@@ -358,6 +376,34 @@ class Milvus:
     
             self.log.info("    Search results: {}".format(str(similar_titles)))
     
+    # Encode query to the text model vector space
+    def _encodeText(self, query):
+        if(self.text_model == None):
+            self.text_model = self._getModel(self.text_model_config["name"])
+        embed = self.text_model.encode(sentences=query,  show_progress_bar=False)
+        embed = embed.reshape(1,-1)
+        if(self.text_model_config["normalize"]):
+            embed = normalize(embed)
+
+        return embed
+
+    # Approximate nearest sentence ids of a query in the text collection, used to measure recall of the index
+    def searchNeighbours(self, query, limit, timer = None):
+        if(self.text_collection == None):
+            self.text_collection = self._getCollection(TEXT_COLLECTION)
+        self.text_collection.load()
+
+        search_params = {"metric_type": self.metric_type, "params": self.index_search_params}
+        embed = self._encodeText(query)
+        if(timer != None):
+            timer.start()
+        results = self.text_collection.search(embed.tolist(), EMBEDDING_FIELD, param=search_params, limit=limit, expr=None)[0]
+        if(timer != None):
+            timer.stop()
+            self.log.info("    Query elapsed time: {}".format(timer.info()))
+
+        return embed[0], [result.id for result in results]
+
     # Search text field
     def searchText(self, query, timer = None):
         if(self.text_model):
@@ -372,15 +418,8 @@ class Milvus:
 
                 if(not self.text_collection.is_empty):    
                     search_params = {"metric_type": self.metric_type, "params": self.index_search_params}
-                    query_embeddings = []
-                    if(self.text_model == None):
-                        self.text_model = self._getModel(self.text_model_config["name"])
                     self.log.info("    Encoding query")
-                    embed = self.text_model.encode(sentences=query,  show_progress_bar=False)
-                    embed = embed.reshape(1,-1)
-                    if(self.text_model_config["normalize"]):
-                        embed = normalize(embed)
-                    query_embeddings = embed.tolist()
+                    query_embeddings = self._encodeText(query).tolist()
 
                     # Mesure query elapsed time
                     if(timer != None):
@@ -406,10 +445,12 @@ class Milvus:
                                     break
                             
                     # Postgres query, title vector ids mapped to titles and their text
+                    # Cursor per search, because searches can run from multiple threads
                     if(len(title_scores) > 0):
                         sql = "select * from " + TABLE_NAME + " where "+ PRIMARY_COLUMN +" in (" + ",".join([str(key) for key in title_scores.keys()]) + ") ;"
-                        self.dbcursor.execute(sql)
-                        rows=self.dbcursor.fetchall()
+                        with self.dbconn.cursor() as cursor:
+                            cursor.execute(sql)
+                            rows=cursor.fetchall()
 
                         similar_titles = []
                         for row in rows:
@@ -427,6 +468,9 @@ class Milvus:
                             self.log.info("    Query elapsed time: {}".format(timer.info()))
                         self.log.info("    Search results: {}".format(str(similar_titles)))
                     else:
+                        if(timer != None):
+                            timer.stop()
+                            self.log.info("    Query elapsed time: {}".format(timer.info()))
                         self.log.info("    No titles found with title results: {}".format(title_results))
 
     # Clear table and colllection data
@@ -441,6 +485,7 @@ class Milvus:
             self.dbconn.commit()
         except Exception as ex:
             self.log.exception("    " + str(ex) )
+        self.embedding_store.clear()
 
     # Drop table and collection data
     def drop(self):
@@ -454,6 +499,7 @@ class Milvus:
             self.dbconn.commit()
         except Exception as ex:
             self.log.exception("    " + str(ex) )
+        self.embedding_store.clear()
     
     # Disconnect clients
     def disconnect(self):
@@ -474,3 +520,27 @@ class Milvus:
         self.title_collection.release()
         self.log.info("    Releasing text collection from memory")
         self.text_collection.release()
+
+    # Index size in bytes, raw vectors of both collections with their ids and the Postgres table size.
+    # Milvus does not report the size of built indexes, so for quantized indexes this is an upper bound
+    def indexSize(self):
+        try:
+            size = 0
+            for name, model_config, fields in ((TITLE_COLLECTION, self.title_model_config, 1), (TEXT_COLLECTION, self.text_model_config, 2)):
+                if(utility.has_collection(name)):
+                    size += self._getCollection(name).num_entities * (model_config["vector_size"] * 4 + fields * 8)
+            with self.dbconn.cursor() as cursor:
+                cursor.execute("SELECT pg_total_relation_size(%s)", (TABLE_NAME,))
+                size += cursor.fetchone()[0]
+
+            return size
+        except Exception as ex:
+            self.log.exception("    " + str(ex) )
+
+            return None
+
+    # Release collections and load the searched text collection again, segments are read from storage into empty memory
+    def reload(self):
+        self.release()
+        self.log.info("    Loading text collection to memory")
+        self.text_collection.load()
@@ -6,7 +6,12 @@ import os
 
 from datetime import date
 from testing.config_tests import *
-from testing.test_utils import Progress
+from testing.test_utils import Progress, CgroupSampler
+from testing.results import ResultStore, RESULTS_PATH, newRunId
+from testing.config_loader import loadConfigs, groupByIndex, configParams
+from testing.workload import Workload
+from testing.scaling import corpusFraction, scalingStep, scalingReport
+from testing.corpus_reader import countDocuments
 from solr.solr import Solr
 from milvus.milvus import Milvus
 
@@ -73,6 +78,12 @@ SOLR_CLIENT_PARAMETERS = {
     "solr_port":8983,
 }
 
+# Containers from docker-compose.yml sampled during tests
+SERVER_CONTAINERS = {
+    "solr":["solr"],
+    "milvus":["milvus-standalone", "postgres", "milvus-etcd", "milvus-minio"],
+}
+
 SOLR_CONFIG1 = {
     "name":"SOLR CONFIG 1",
     "core":"english",
@@ -88,19 +99,200 @@ SOLR_CONFIG3 = {
     "core":"slovene",
 }
 
+OPEN_LOOP_WORKERS = 32 # Default worker pool for open loop mode
+OPEN_LOOP_DURATION = 10 # Default seconds per rate for open loop mode
+
+# Sequential query test or concurrent one when more than one worker is set
+def runQueryTest(instance, corpus, cache = None):
+    transfer = hasattr(instance, "transferStats")
+    if(transfer):
+        instance.transferStats(reset = True)
+        instance.transportStats(reset = True)
+    cached = getattr(instance, "result_cache", None) != None
+    if(cached):
+        instance.cacheStats(reset = True)
+
+    if(mode == "replay"):
+        workers = concurrency if concurrency > 1 else OPEN_LOOP_WORKERS
+        result = testQueryReplay(instance, corpus, progress, speed, workers, cache, latency_samples)
+    elif(mode == "open"):
+        workers = concurrency if concurrency > 1 else OPEN_LOOP_WORKERS
+        rate_duration = duration if duration != None else OPEN_LOOP_DURATION
+        result = testQueryOpenLoop(instance, corpus, progress, rates, arrival, rate_duration, slo, workers, cache, latency_samples)
+    elif(concurrency > 1 or duration != None):
+        result = testQueryConcurrent(instance, corpus, progress, concurrency, repeat, duration, cache, latency_samples)
+    else:
+        result = testQuery(instance, corpus, progress, cache, latency_samples)
+
+    # Bytes sent and received by the search requests of the test
+    if(transfer):
+        result["transfer"] = instance.transferStats()
+        print("   search requests: {} request bytes: {} response bytes: {} decoded with: {}".format(result["transfer"]["requests"],
+            result["transfer"]["request_bytes"], result["transfer"]["response_bytes"], result["transfer"]["json_decoder"]))
+        result["transport"] = instance.transportStats()
+        print("   HTTP requests: {requests} connections: {connections} reused: {reused}".format(**result["transport"]))
+    # Client result cache counters of the test
+    if(cached):
+        result["result_cache"] = instance.cacheStats()
+        print("   result cache hits: {hits} misses: {misses} evictions: {evictions} expired: {expired} invalidations: {invalidations}".format(**result["result_cache"]))
+
+    return result
+
+# Solr config with the HTTP pool, gzip updates, index workers and the commit strategy given by argument, as strategy or strategy:milliseconds for commitWithin
+def withCommit(solr_config):
+    solr_config = dict(solr_config)
+    if(pool_size != None or gzip_updates != None):
+        http = dict(solr_config.get("http") or {})
+        if(pool_size != None):
+            http["pool_maxsize"] = pool_size
+        if(gzip_updates != None):
+            http["gzip_updates"] = gzip_updates == 1
+        solr_config["http"] = http
+    if(index_workers != None):
+        solr_config["index_workers"] = index_workers
+    if(commit_strategy == None):
+        return solr_config
+    strategy, _, within = commit_strategy.partition(":")
+    solr_config["commit"] = strategy
+    if(within):
+        solr_config["commit_within"] = int(within)
+
+    return solr_config
+
+# Solr config with the text search mode and the result cache given by argument, the cache as size or size:ttl seconds
+def withSearchMode(solr_config):
+    if(search_mode == None and result_cache == None):
+        return solr_config
+    solr_config = dict(solr_config)
+    search = dict(solr_config.get("search") or {})
+    if(search_mode != None):
+        search["mode"] = search_mode
+    if(result_cache != None):
+        cache_size, _, cache_ttl = result_cache.partition(":")
+        search["cache_size"] = int(cache_size)
+        if(cache_ttl):
+            search["cache_ttl"] = float(cache_ttl)
+    solr_config["search"] = search
+
+    return solr_config
+
+# Batch argument is bytes or bytes:docs of positive integers
+def validBatchSize(batch_size):
+    batch_bytes, separator, batch_docs = batch_size.partition(":")
+
+    return batch_bytes.isnumeric() and int(batch_bytes) > 0 and (not separator or (batch_docs.isnumeric() and int(batch_docs) > 0))
+
+# Config with the batch bytes and docs given by argument as bytes or bytes:docs, and adaptive batching when enabled
+def withBatching(index_config):
+    index_config = dict(index_config)
+    if(batch_size != None):
+        batch_bytes, _, batch_docs = batch_size.partition(":")
+        index_config["batch_bytes"] = int(batch_bytes)
+        if(batch_docs):
+            index_config["batch_docs"] = int(batch_docs)
+    if(adaptive_batching != None):
+        index_config["adaptive_batching"] = adaptive_batching == 1
+    if(batch_latency != None):
+        index_config["batch_max_latency"] = batch_latency
+
+    return index_config
+
+# Corpus with queries of the workload file given by argument or by the config file instead of the built in queries,
+# and indexed from the compiled corpus cache when enabled
+def prepareCorpus(corpus, workload = None):
+    workload = workload if workload != None else queries_file
+    corpus = dict(corpus)
+    corpus["cache"] = corpus_cache == 1
+    if(workload != None):
+        corpus["queries"] = workload if isinstance(workload, Workload) else Workload(workload)
+
+    return corpus
+
+# Query phases of a config: optional cold start after reloading, warm-up excluded from statistics, query test and recall
+def runQueryTests(instance, system, config, corpus):
+    if(cold_start == 1):
+        print("-> cold start querying")
+        recordResult(testColdStart(instance, corpus, progress, latency_samples), system, config, corpus)
+
+    cache = None
+    if(warmup_queries != None or warmup_seconds != None):
+        print("-> warming up")
+        warmUp(instance, corpus, warmup_queries, warmup_seconds)
+        cache = "warm"
+
+    print("-> querying documents")
+    recordResult(runQueryTest(instance, corpus, cache), system, config, corpus)
+
+    if(system == "milvus" and recall_k != None):
+        print("-> measuring recall")
+        recordResult(testRecall(instance, corpus, progress, recall_k), system, config, corpus)
+
+# Write result of a test phase to the result store
+def recordResult(result, system, config, corpus):
+    if(result == None):
+        return
+    run = {
+        "run_id": run_id,
+        "system": system,
+        "config": config["name"],
+        "params": configParams(config),
+        "corpus": {"name": corpus.get("name"), "path": corpus["path"], "format": corpus["format"], "queries": len(corpus["queries"]),
+                   "workload": corpus["queries"].file if isinstance(corpus["queries"], Workload) else None},
+    }
+    resultStore.write(run, result)
+
+# Index and query a config at increasing corpus fractions, then fit the growth of each metric with the number of documents
+def runScalingTest(instance, system, config, corpus):
+    total = countDocuments(corpus["path"], corpus["format"])
+    steps = []
+    for fraction in sorted(fractions):
+        part = corpusFraction(corpus, fraction / 100, total)
+        print("-> scaling step {:g}% {} documents".format(fraction, part["documents"]))
+        if(system == "solr"):
+            instance.initCore()
+        else:
+            instance.initServices()
+
+        index_result = testIndex(instance, part, progress)
+        index_size = instance.indexSize()
+        index_result.update({"fraction": fraction / 100, "documents": part["documents"], "index_size": index_size})
+        recordResult(index_result, system, config, part)
+
+        if(warmup_queries != None or warmup_seconds != None):
+            warmUp(instance, part, warmup_queries, warmup_seconds)
+        query_result = runQueryTest(instance, part)
+        query_result.update({"fraction": fraction / 100, "documents": part["documents"]})
+        recordResult(query_result, system, config, part)
+        steps.append(scalingStep(fraction / 100, part["documents"], index_result, query_result, index_size))
+
+        # Every step indexes its fraction from empty
+        if(fraction != max(fractions)):
+            instance.clear()
+            if(system == "milvus"):
+                instance.drop()
+
+    fits, table = scalingReport(steps)
+    print(table)
+    logging.info("Scaling test {}:\n{}".format(config["name"], table))
+    recordResult({"phase": "scaling", "steps": steps, "fits": fits}, system, config, corpus)
+
 def testSolrConfig(config, action, clear):
     print("-> initializing system")
     solr = None
+    solr_config = None
     corpus = None
     if(config == 1):
-        solr = Solr(SOLR_CLIENT_PARAMETERS, SOLR_CONFIG1)
+        solr_config = SOLR_CONFIG1
         corpus = corpus_amazonReviews
     elif(config == 2):
-        solr = Solr(SOLR_CLIENT_PARAMETERS, SOLR_CONFIG2)
+        solr_config = SOLR_CONFIG2
         corpus = corpus_commonCrawl
     elif(config == 3):
-        solr = Solr(SOLR_CLIENT_PARAMETERS, SOLR_CONFIG3)
+        solr_config = SOLR_CONFIG3
         corpus = corpus_ccGigafida
+    corpus = prepareCorpus(corpus)
+    solr_config = withSearchMode(withCommit(withBatching(solr_config)))
+    solr = Solr(SOLR_CLIENT_PARAMETERS, solr_config)
 
     if(action == "purge"):
           solr.initCore()
@@ -110,16 +302,16 @@ def testSolrConfig(config, action, clear):
         if(action == "index"):
             print("-> indexing documents")
             solr.initCore()
-            testIndex(solr, corpus, progress)
+            recordResult(testIndex(solr, corpus, progress), "solr", solr_config, corpus)
         elif(action == "query"):
-            print("-> querying documents")
-            testQuery(solr, corpus, progress)
+            runQueryTests(solr, "solr", solr_config, corpus)
+        elif(fractions != None):
+            runScalingTest(solr, "solr", solr_config, corpus)
         else:
             solr.initCore()
             print("-> indexing documents")
-            testIndex(solr, corpus, progress)
-            print("-> querying documents")
-            testQuery(solr, corpus, progress)
+            recordResult(testIndex(solr, corpus, progress), "solr", solr_config, corpus)
+            runQueryTests(solr, "solr", solr_config, corpus)
 
         if(clear == 1):
             print("-> clearing data")
@@ -128,16 +320,20 @@ def testSolrConfig(config, action, clear):
 def testMilvusConfig(config, action, clear, drop):
     print("-> initializing system")
     milvus = None
+    milvus_config = None
     corpus = None
     if(config == 1):
-        milvus =  Milvus(MILVUS_CLIENT_PARAMETERS, MILVUS_CONFIG1)
+        milvus_config = MILVUS_CONFIG1
         corpus = corpus_amazonReviews
     elif(config == 2):
-        milvus =  Milvus(MILVUS_CLIENT_PARAMETERS, MILVUS_CONFIG2)
+        milvus_config = MILVUS_CONFIG2
         corpus = corpus_commonCrawl
     elif(config == 3):
-        milvus =  Milvus(MILVUS_CLIENT_PARAMETERS, MILVUS_CONFIG3)
+        milvus_config = MILVUS_CONFIG3
         corpus = corpus_ccGigafida
+    corpus = prepareCorpus(corpus)
+    milvus_config = withBatching(milvus_config)
+    milvus =  Milvus(MILVUS_CLIENT_PARAMETERS, milvus_config, recall_k != None)
 
     try:
         if(action == "purge"):  
@@ -150,16 +346,16 @@ def testMilvusConfig(config, action, clear, drop):
             if(action == "index"):
                 print("-> indexing documents")
                 milvus.initServices()
-                testIndex(milvus, corpus, progress)
+                recordResult(testIndex(milvus, corpus, progress), "milvus", milvus_config, corpus)
             elif(action == "query"):
-                print("-> querying documents")
-                testQuery(milvus, corpus, progress)
+                runQueryTests(milvus, "milvus", milvus_config, corpus)
+            elif(fractions != None):
+                runScalingTest(milvus, "milvus", milvus_config, corpus)
             else:
                 milvus.initServices()
                 print("-> indexing documents")
-                testIndex(milvus, corpus, progress)
-                print("-> querying documents")
-                testQuery(milvus, corpus, progress)
+                recordResult(testIndex(milvus, corpus, progress), "milvus", milvus_config, corpus)
+                runQueryTests(milvus, "milvus", milvus_config, corpus)
 
             if(clear == 1):
                 print("-> clearing data")
@@ -176,15 +372,96 @@ def testMilvusConfig(config, action, clear, drop):
         milvus.disconnect()
 
 
+# Run configs loaded from a config file. Configs differing only in search parameters are queried on one indexed state,
+# so a grid over search parameters is indexed once
+def testConfigFile(configs, action, iteration, clear, drop):
+    groups = groupByIndex(configs)
+    for group in groups:
+        index_config = group[0]
+        system = index_config["system"].lower()
+        corpus = index_config["corpus"]
+        if(isinstance(corpus, str)):
+            corpus = CORPORA[corpus]
+        corpus = prepareCorpus(corpus)
+
+        print("\nConfig {}".format(index_config["name"]))
+        print("-> initializing system")
+        if(system == "solr"):
+            index_config = withSearchMode(withCommit(withBatching(index_config)))
+            instance = Solr(index_config.get("client", SOLR_CLIENT_PARAMETERS), index_config)
+        else:
+            index_config = withBatching(index_config)
+            instance = Milvus(index_config.get("client", MILVUS_CLIENT_PARAMETERS), index_config, recall_k != None)
+
+        # Groups are indexed by this run unless it only queries or purges an indexed state
+        indexed = (fractions != None and action == None) or (action != "query" and action != "purge")
+        try:
+            if(fractions != None and action == None):
+                runScalingTest(instance, system, index_config, corpus)
+            elif(indexed):
+                print("-> indexing documents")
+                if(system == "solr"):
+                    instance.initCore()
+                else:
+                    instance.initServices()
+                recordResult(testIndex(instance, corpus, progress), system, index_config, corpus)
+
+            if(action != "index" and action != "purge" and not (fractions != None and action == None)):
+                for config in group:
+                    if(system == "solr"):
+                        config = withSearchMode(config)
+                    instance.setSearchParams(config)
+                    for i in range(iteration):
+                        print("-> {} test {}".format(config["name"], i+1))
+                        runQueryTests(instance, system, config, prepareCorpus(corpus, config.get("workload")))
+
+            if(clear == 1 or action == "purge"):
+                print("-> clearing data")
+                instance.clear()
+            if(system == "milvus"):
+                # Collections have fixed names, the next group indexed by this run needs them created with its own index
+                if(drop == 1 or action == "purge" or (indexed and group is not groups[-1])):
+                    print("-> dropping colections")
+                    instance.drop()
+                else:
+                    print("-> releasing collections from memory")
+                    instance.release()
+        finally:
+            if(system == "milvus"):
+                instance.disconnect()
+
 output_width = 50
 progress = Progress(output_width)
 print_format = "| {:^"+str(output_width - 4)+"} |"
 border = "-"*output_width
 
-def runTests(system, config, action, iteration, clear, drop):
+# Add cgroup samplers for containers by name or processes by pid
+def initServerSampling(system):
+    names = containers if containers != None else SERVER_CONTAINERS.get(system, [])
+    for name in names:
+        if(name.isnumeric()):
+            try:
+                sampler = CgroupSampler.fromPid(int(name))
+            except OSError as ex:
+                logging.warning("    Server sampling of pid {} disabled: {}".format(name, ex))
+                sampler = None
+        else:
+            sampler = CgroupSampler.fromContainer(name)
+        if(sampler != None):
+            logging.info("    Sampling server {} cgroups {}".format(sampler.name, sampler.cgroups))
+            execTester.addSampler(sampler)
+
+def runTests(system, config, action, iteration, clear, drop, configs = None):
+    global run_id
+    run_id = newRunId(system, config)
     print("\n" + border + "\n" + print_format.format("TESTING STARTED") + "\n" + border)
+    initServerSampling(system)
 
-    if(system == "solr"):
+    if(configs != None):
+        print("\n" + border + "\n" + print_format.format("TESTING CONFIG FILE") + "\n" + border)
+        testConfigFile(configs, action, iteration, clear, drop)
+
+    elif(system == "solr"):
         print("\n" + border + "\n" + print_format.format("TESTING SOLR") + "\n" + border)
 
         for i in range(iteration):
@@ -192,7 +469,7 @@ def runTests(system, config, action, iteration, clear, drop):
             testSolrConfig(config, action, clear)
             print()
 
-    if(system == "milvus"):
+    elif(system == "milvus"):
         print("\n" + border + "\n" + print_format.format("TESTING MILVUS") + "\n" + border)
 
         for i in range(iteration):
@@ -201,7 +478,8 @@ def runTests(system, config, action, iteration, clear, drop):
             print()
 
     print("\n" + border + "\n" + print_format.format("TESTING ENDED") + "\n" + border)
-    print("Results in: {}\n".format(filename))
+    print("Results in: {}".format(filename))
+    print("Run {} records in: {}\n".format(run_id, resultStore.file))
 
 system = None
 config = None
@@ -209,6 +487,36 @@ action = None
 drop = 1
 clear = 1
 iteration = 1
+concurrency = 1
+repeat = 1
+duration = None
+mode = "closed"
+rates = [1, 5, 10, 20, 50]
+arrival = "constant"
+slo = None
+containers = None
+interval = None
+run_id = None
+results_file = RESULTS_PATH
+config_file = None
+recall_k = None
+warmup_queries = None
+warmup_seconds = None
+cold_start = 0
+queries_file = None
+speed = 1
+fractions = None
+corpus_cache = 0
+commit_strategy = None
+index_workers = None
+batch_size = None
+adaptive_batching = None
+batch_latency = None
+search_mode = None
+result_cache = None
+pool_size = None
+gzip_updates = None
+latency_samples = LATENCY_SAMPLES
 filename="logs/{}.log".format(date.today().strftime("%d-%m-%Y"))
 
 argumentList = sys.argv[1:]
@@ -225,7 +533,35 @@ for i in range(arguments_num):
             " -i  --Iteration   Number of tests. Default is one, which is recommended for indexing of larger files.\n"+
             " -d  --Drop        Drop table and collections, enabled by default. This only works with Milvus system. [0/1]\n"+
             " -c  --Clear       Clear data, enabled by default.  [0/1]\n"+
-            " -f  --File        Specifiy absolute path for the log file. Default directory is in App/logs/. ")
+            " -f  --File        Specifiy absolute path for the log file. Default directory is in App/logs/.\n"+
+            " -n  --Concurrency Number of concurrent query workers. Default is one, which runs queries sequentially.\n"+
+            " -r  --Repeat      Number of passes over the queries done by concurrent workers. Default is one.\n"+
+            " -D  --Duration    Run concurrent workers for the given number of seconds instead of a number of passes. In open mode seconds per rate, default 10.\n"+
+            " -m  --Mode        Load mode of the query test. Open mode sends queries at target rates and replay mode at workload timestamps, using concurrency as worker pool (default 32). [closed/open/replay]\n"+
+            " -R  --Rates       Comma separated query rates per second swept in open mode. Default is 1,5,10,20,50.\n"+
+            " -A  --Arrival     Arrival of queries in open mode. [constant/poisson]\n"+
+            " -S  --SLO         P99 latency objective in milliseconds, open mode stops at the first rate breaking it.\n"+
+            " -x  --Containers  Comma separated container names or pids sampled for server resources. Default are the system's containers, none disables it.\n"+
+            " -I  --Interval    Resource sampling interval in milliseconds. Default is 50.\n"+
+            " -o  --Results     Specify path for the JSONL results file. Default is App/results/results.jsonl.\n"+
+            " -C  --Config      YAML or JSON config file used instead of system and test case. Matrix values are expanded to a grid of configs.\n"+
+            " -k  --Recall      Measure recall@k of the Milvus index against exact search of embeddings stored while indexing.\n"+
+            " -w  --Warmup      Warm-up before each query test, excluded from statistics. Number of queries or seconds with an s suffix, for example 100 or 30s.\n"+
+            " -W  --Cold        Measure a cold start query pass after reloading the Solr core or Milvus collections, disabled by default. [0/1]\n"+
+            " -q  --Queries     Query workload file used instead of the test case queries. One query per line or JSONL with query and optional timestamp fields.\n"+
+            " -P  --Speed       Replay speed factor of the workload timestamps in replay mode. Default is 1, the captured speed.\n"+
+            " -F  --Fractions   Comma separated corpus percentages of a scaling test, which indexes and queries each fraction and fits the growth. Example: 1,10,50,100\n"+
+            " -K  --Cache       Index from a compiled corpus cache in App/data/cache/, compiled on first use with the Milvus sentence chunks. [0/1]\n"+
+            " -M  --Commit      Solr commit strategy, hard commit per batch by default. Within takes milliseconds, for example within:5000. [batch/within/soft/final]\n"+
+            " -b  --IndexWorkers Parallel Solr update requests while indexing, batches are serialized ahead into a bounded queue. [1-N]\n"+
+            " -B  --Batch       Index batch payload in bytes and optionally max docs, 4 MiB and 10000 docs by default, for example 1048576:5000. [bytes[:docs]]\n"+
+            " -G  --Adaptive    Grow or shrink index batches by observed request throughput, starting from the batch bytes. [0/1]\n"+
+            " -T  --BatchLatency Max index request latency in milliseconds, adaptive batches shrink after slower requests.\n"+
+            " -Q  --SearchMode  Solr text search as a phrase and a term request in sequence or at once, or one combined or edismax request. [sequential/parallel/combined/edismax]\n"+
+            " -E  --ResultCache Client Solr result cache of size entries, optionally expiring after ttl seconds, for example 1000:60. [size[:ttl]]\n"+
+            " -p  --Pool        Max kept alive connections of a Solr client, 10 by default. Size it by the query or index workers. [1-N]\n"+
+            " -z  --GzipUpdates Send Solr update bodies gzip compressed, Solr has to inflate request bodies. [0/1]\n"+
+            " -L  --Latencies   Per query latencies kept in a query record, 1000 by default, 0 keeps only the latency histograms. [0-N] ")
 
         exit()
 
@@ -245,17 +581,91 @@ for i in range(arguments_num):
             clear = int(currentValue)
         elif(currentArgument in ("-f", "--File") and currentValue.isnumeric):
             filename = currentValue
+        elif(currentArgument in ("-n", "--Concurrency") and currentValue.isnumeric()):
+            concurrency = int(currentValue)
+        elif(currentArgument in ("-r", "--Repeat") and currentValue.isnumeric()):
+            repeat = int(currentValue)
+        elif(currentArgument in ("-D", "--Duration")):
+            duration = float(currentValue)
+        elif(currentArgument in ("-m", "--Mode")):
+            mode = currentValue.lower()
+        elif(currentArgument in ("-R", "--Rates")):
+            rates = [float(rate) for rate in currentValue.split(",")]
+        elif(currentArgument in ("-A", "--Arrival")):
+            arrival = currentValue.lower()
+        elif(currentArgument in ("-S", "--SLO")):
+            slo = float(currentValue) / 1000
+        elif(currentArgument in ("-x", "--Containers")):
+            containers = [] if currentValue.lower() == "none" else currentValue.split(",")
+        elif(currentArgument in ("-I", "--Interval") and currentValue.isnumeric()):
+            interval = int(currentValue) / 1000
+        elif(currentArgument in ("-o", "--Results")):
+            results_file = currentValue
+        elif(currentArgument in ("-C", "--Config")):
+            config_file = currentValue
+        elif(currentArgument in ("-k", "--Recall") and currentValue.isnumeric()):
+            recall_k = int(currentValue)
+        elif(currentArgument in ("-w", "--Warmup")):
+            if(currentValue.lower().endswith("s")):
+                warmup_seconds = float(currentValue[:-1])
+            else:
+                warmup_queries = int(currentValue)
+        elif(currentArgument in ("-W", "--Cold") and currentValue.isnumeric()):
+            cold_start = int(currentValue)
+        elif(currentArgument in ("-q", "--Queries")):
+            queries_file = currentValue
+        elif(currentArgument in ("-P", "--Speed")):
+            speed = float(currentValue)
+        elif(currentArgument in ("-F", "--Fractions")):
+            fractions = [float(fraction) for fraction in currentValue.split(",")]
+        elif(currentArgument in ("-K", "--Cache") and currentValue.isnumeric()):
+            corpus_cache = int(currentValue)
+        elif(currentArgument in ("-M", "--Commit")):
+            commit_strategy = currentValue.lower()
+        elif(currentArgument in ("-b", "--IndexWorkers") and currentValue.isnumeric()):
+            index_workers = int(currentValue)
+        elif(currentArgument in ("-B", "--Batch")):
+            batch_size = currentValue
+        elif(currentArgument in ("-G", "--Adaptive") and currentValue.isnumeric()):
+            adaptive_batching = int(currentValue)
+        elif(currentArgument in ("-T", "--BatchLatency") and currentValue.isnumeric()):
+            batch_latency = int(currentValue)
+        elif(currentArgument in ("-Q", "--SearchMode")):
+            search_mode = currentValue.lower()
+        elif(currentArgument in ("-E", "--ResultCache")):
+            result_cache = currentValue
+        elif(currentArgument in ("-p", "--Pool") and currentValue.isnumeric()):
+            pool_size = int(currentValue)
+        elif(currentArgument in ("-z", "--GzipUpdates") and currentValue.isnumeric()):
+            gzip_updates = int(currentValue)
+        elif(currentArgument in ("-L", "--Latencies") and currentValue.isnumeric()):
+            latency_samples = int(currentValue)
        
 
+configs = None
+if(config_file != None):
+    configs = loadConfigs(config_file)
+    system = configs[0]["system"].lower()
+    config = os.path.splitext(os.path.basename(config_file))[0]
+
 if(system == None or config == None):
-    print("Error system and config number must be given.\nExample: -s Solr -t 1")
+    print("Error system and config number or a config file must be given.\nExample: -s Solr -t 1")
+elif(action == "query" and configs != None and system == "milvus" and len(groupByIndex(configs)) > 1):
+    print("Error a query run of a Milvus config file needs configs of one indexed state, the file has {} index groups.\nIndex and query them without -a query".format(len(groupByIndex(configs))))
+elif(batch_size != None and not validBatchSize(batch_size)):
+    print("Error batch must be positive bytes and optionally max docs, got {}.\nExample: -B 1048576:5000".format(batch_size))
+elif(mode == "replay" and queries_file == None and (configs == None or any(c.get("workload") == None for c in configs))):
+    print("Error replay mode needs a query workload with timestamps, the test case queries have none.\nExample: -m replay -q workload.jsonl")
 else:
     # Check if logs dir exists
     if(not os.path.exists(LOG_PATH)):
         os.makedirs(LOG_PATH)
     logging.basicConfig(stream=open(filename, 'a', encoding='utf-8'), level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s', datefmt='%d/%m/%Y %I:%M:%S %p')
 
-    runTests(system, config, action, iteration, clear,  drop)
+    if(interval != None):
+        execTester.interval = interval
+    resultStore = ResultStore(results_file)
+    runTests(system, config, action, iteration, clear,  drop, configs)
 
              
 
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import sys
+
+from testing.micro_benchmarks import checkPartition, benchmarkPartition, benchmarkSerialize, benchmarkSend, checkDecode, benchmarkDecode
+
+BENCHMARKS = ("split", "serialize", "send", "decode")
+
+benchmark = "all"
+sizes_mb = [1, 4, 16]
+repeat = 3
+legacy = 1
+
+argumentList = sys.argv[1:]
+arguments_num = len(argumentList)
+
+for i in range(arguments_num):
+    currentArgument = argumentList[i]
+
+    if(arguments_num == 1 and currentArgument in ("-h", "--Help")):
+        print("Script runs micro benchmarks of client hot paths, each after a correctness check of the benchmarked code.\n"+
+            " -b  --Benchmark  Benchmark to run. Default is all. [all/split/serialize/send/decode]\n"+
+            " -s  --Sizes      Comma separated document and response sizes in MB. Default is 1,4,16.\n"+
+            " -r  --Repeat     Repeats of every measurement, the best time is reported. Default is 3.\n"+
+            " -L  --Legacy     Also time the previous implementation as baseline. Default is 1. [0/1] ")
+
+        exit()
+
+    elif(i % 2 == 0):
+        currentValue = argumentList[i+1]
+        if(currentArgument in ("-b", "--Benchmark")):
+            benchmark = currentValue.lower()
+        elif(currentArgument in ("-s", "--Sizes")):
+            sizes_mb = [float(size) for size in currentValue.split(",")]
+        elif(currentArgument in ("-r", "--Repeat") and currentValue.isnumeric()):
+            repeat = int(currentValue)
+        elif(currentArgument in ("-L", "--Legacy") and currentValue.isnumeric()):
+            legacy = int(currentValue)
+
+def printResults(results):
+    def value(result, key, pattern = "{:.2f}", scale = 1):
+        return pattern.format(result[key] * scale) if result.get(key) != None else "-"
+
+    print("| Benchmark | Size (MB) | Input | Items | Time (ms) | MB/s | Peak (MB) | Legacy time (ms) | Legacy peak (MB) | Speedup |")
+    print("|" + " --- |" * 10)
+    for result in results:
+        legacy_seconds = result["legacy_seconds"]
+        print("| {} | {:g} | {} | {} | {} | {} | {} | {} | {} | {} |".format(result["benchmark"], result["size_mb"], result["input"], result["items"],
+            value(result, "seconds", scale = 1000), value(result, "mb_per_s", "{:.1f}"), value(result, "peak_mb"),
+            value(result, "legacy_seconds", scale = 1000), value(result, "legacy_peak_mb"),
+            "{:.1f}x".format(legacy_seconds / result["seconds"]) if legacy_seconds != None and result["seconds"] > 0 else "-"))
+
+if(benchmark != "all" and benchmark not in BENCHMARKS):
+    print("Error unknown benchmark {}, use one of {}".format(benchmark, ("all",) + BENCHMARKS))
+else:
+    if(benchmark in ("all", "split")):
+        print("-> checking document split")
+        print("Checked {} parts".format(checkPartition()))
+        print("-> benchmarking document split")
+        printResults(benchmarkPartition(sizes_mb, repeat, legacy == 1))
+    if(benchmark in ("all", "serialize")):
+        print("-> benchmarking update serialization")
+        printResults(benchmarkSerialize(sizes_mb, repeat, legacy == 1))
+    if(benchmark in ("all", "send")):
+        print("-> benchmarking update requests to a local server")
+        printResults(benchmarkSend(sizes_mb, repeat, legacy == 1))
+    if(benchmark in ("all", "decode")):
+        print("-> checking response decoding")
+        print("Checked {} docs".format(checkDecode()))
+        print("-> benchmarking response decoding")
+        printResults(benchmarkDecode(sizes_mb, repeat, legacy == 1))
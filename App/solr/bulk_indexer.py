@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import logging
+import queue
+import threading
+import time
+from solr.lib.pysolr import Solr as SolrClient
+
+LOG = logging.getLogger("_solr_")
+
+# Parallel update requests of pre-serialized document batches. Batches are serialized by the caller and put to a bounded queue,
+# so serialization overlaps with Solr analyzing earlier batches while at most queue_size batches wait in memory.
+# Each worker sends with its own client, failed batches are reported in submit order when the indexer is closed.
+# Sent batches are observed by the batch sizer in windows of one batch per worker, as bytes over the wall clock time of the window.
+# Requests run in parallel, so the aggregate throughput sizes the next submitted batches, the slowest request of the window
+# shrinks them when it exceeds the max latency of the sizer
+class BulkIndexer():
+    def __init__(self, url, workers = 4, queue_size = None, commit_params = None, sizer = None, client_args = None, log = LOG):
+        self.url = url
+        self.workers = workers
+        self.commit_params = commit_params or {}
+        self.client_args = client_args or {}
+        self.sizer = sizer
+        self.log = log
+        self.serializer = SolrClient(url, **self.client_args)
+        self.batches = queue.Queue(maxsize = queue_size if queue_size != None else workers * 2)
+        self.lock = threading.Lock()
+        self.threads = []
+        self.stats = []
+        self.errors = []
+        self.sequence = 0
+        self.completed = 0
+        self._resetWindow()
+
+    def _resetWindow(self):
+        self.window_start = time.perf_counter()
+        self.window_batches = 0
+        self.window_docs = 0
+        self.window_bytes = 0
+        self.window_latency = 0.0
+
+    def start(self):
+        self._resetWindow()
+        self.stats = [{"worker": w+1, "batches": 0, "docs": 0, "bytes": 0, "busy_time": 0.0} for w in range(self.workers)]
+        for w in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(w,))
+            thread.start()
+            self.threads.append(thread)
+
+    # Serialize a batch in the calling thread and queue it, blocks while the queue is full
+    def submit(self, docs, last_id):
+        solrapi, message, doc_count = self.serializer._build_docs(docs, clean_ctrl_chars=True)
+        self.sequence += 1
+        self.batches.put((self.sequence, last_id, doc_count, solrapi, message))
+
+    def _work(self, worker):
+        client = SolrClient(self.url, **self.client_args)
+        stats = self.stats[worker]
+        while True:
+            batch = self.batches.get()
+            if(batch == None):
+                stats["transport"] = client.transport_stats()
+                break
+
+            sequence, last_id, doc_count, solrapi, message = batch
+            time_start = time.perf_counter()
+            try:
+                client._update(message, clean_ctrl_chars=False, solrapi=solrapi, **self.commit_params)
+                with self.lock:
+                    self.completed += doc_count
+                    self.window_batches += 1
+                    self.window_docs += doc_count
+                    self.window_bytes += len(message)
+                    self.window_latency = max(self.window_latency, time.perf_counter() - time_start)
+                    if(self.sizer != None and self.window_batches >= self.workers):
+                        self.sizer.observe(self.window_docs, self.window_bytes, time.perf_counter() - self.window_start, self.window_batches,
+                                           self.window_latency)
+                        self._resetWindow()
+                stats["docs"] += doc_count
+            except Exception as ex:
+                with self.lock:
+                    self.errors.append((sequence, last_id, doc_count, worker+1, ex))
+            finally:
+                stats["batches"] += 1
+                stats["bytes"] += len(message)
+                stats["busy_time"] += time.perf_counter() - time_start
+
+    # Wait for queued batches, log worker throughput and errors ordered by batch, return the worker stats
+    def close(self):
+        for _ in self.threads:
+            self.batches.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        # Batches of the last partial window are counted without adapting, no batches follow them
+        if(self.sizer != None and self.window_batches > 0):
+            self.sizer.observe(self.window_docs, self.window_bytes, 0, self.window_batches)
+            self._resetWindow()
+
+        for stats in self.stats:
+            stats["throughput"] = stats["docs"] / stats["busy_time"] if stats["busy_time"] > 0 else 0
+            self.log.info("    Worker {}: Batches: {} Docs: {} Bytes: {} Busy: {}s Throughput: {} docs/s".format(
+                stats["worker"], stats["batches"], stats["docs"], stats["bytes"], stats["busy_time"], stats["throughput"]))
+
+        self.errors.sort(key=lambda error: error[0])
+        for sequence, last_id, doc_count, worker, ex in self.errors:
+            self.log.error("    Batch {} of {} docs up to id {} failed on worker {}: {}".format(sequence, doc_count, last_id, worker, ex))
+
+        return self.stats
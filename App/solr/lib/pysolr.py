@@ -2,15 +2,21 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import ast
+import asyncio
 import datetime
+import gzip
 import logging
+import zlib
 import os
 import random
 import re
+import threading
 import time
 from xml.etree import ElementTree
 
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 from pkg_resources import DistributionNotFound, get_distribution, parse_version
 
 try:
@@ -18,6 +24,16 @@ try:
 except ImportError:
     KazooClient = KazooState = None
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 try:
     # Prefer simplejson, if installed.
     import simplejson as json
@@ -233,6 +249,116 @@ def clean_xml_string(s):
     return "".join(c for c in s if is_valid_xml_char_ordinal(ord(c)))
 
 
+# Control characters removed by ``sanitize``, tab, newline and carriage return are kept
+CONTROL_CHARS_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Bytes of a response read from the connection at once
+READ_CHUNK = 64 * 1024
+# Bytes of a streamed request body written to the connection at once
+STREAM_CHUNK = 64 * 1024
+
+
+def strip_ctrl_chars(value):
+    """
+    Removes the control characters of ``sanitize`` from a string in one pass.
+    """
+    return CONTROL_CHARS_RE.sub("", value)
+
+
+class BytesJSONDecoder(object):
+    """
+    JSON decoder of response bodies as received, ``accepts_bytes`` tells
+    ``Solr`` to pass the raw bytes instead of decoding them to a string first.
+
+    ``backend`` is ``"orjson"``, ``"json"`` or ``"auto"``, which uses
+    ``orjson`` when installed and the ``json`` module otherwise. Documents
+    ``orjson`` rejects, as the ``NaN`` of a Solr float, are decoded again with
+    the ``json`` module.
+    """
+
+    accepts_bytes = True
+
+    def __init__(self, backend="auto"):
+        if backend == "auto":
+            backend = "orjson" if orjson is not None else "json"
+
+        if backend == "orjson":
+            if orjson is None:
+                raise ValueError("The orjson backend requires `orjson` to be installed")
+            self.loads = orjson.loads
+        elif backend == "json":
+            self.loads = json.loads
+        else:
+            raise ValueError("Unknown JSON backend '%s'" % backend)
+        self.backend = backend
+
+    def decode(self, data):
+        try:
+            return self.loads(data)
+        except ValueError:
+            if self.loads is json.loads:
+                raise
+            return json.loads(data)
+
+
+class StreamBody(object):
+    """
+    Request body produced in chunks by ``chunks()``, sent with chunked
+    transfer encoding instead of being joined in memory.
+
+    Small chunks, as the documents of a batch, are joined to chunks of at
+    least ``buffer_size`` bytes, so the body is written to the connection in
+    a few large writes instead of several per document.
+
+    The body can be iterated again, so a retried request sends it again.
+    ``sent_bytes`` counts the bytes of the last iteration.
+    """
+
+    def __init__(self, chunks, buffer_size=STREAM_CHUNK):
+        self.chunks = chunks
+        self.buffer_size = buffer_size
+        self.sent_bytes = 0
+
+    def __iter__(self):
+        self.sent_bytes = 0
+        buffer = bytearray()
+        for chunk in self.chunks():
+            buffer += chunk
+            if len(buffer) >= self.buffer_size:
+                self.sent_bytes += len(buffer)
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            self.sent_bytes += len(buffer)
+            yield bytes(buffer)
+
+
+def decode_content(data, encoding):
+    """
+    Decodes a response body sent with ``Content-Encoding`` gzip or deflate,
+    other bodies are returned as sent.
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(data)
+        except zlib.error:
+            # Raw deflate without the zlib header
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+    return data
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
 class SolrError(Exception):
     pass
 
@@ -276,6 +402,10 @@ class Results(object):
 
     The full response from Solr is provided as the `raw_response` dictionary for
     use with features which change the response format.
+
+    ``request_bytes`` and ``response_bytes`` hold the size of the request URL
+    and body and of the response body before gzip decoding, when set by
+    ``Solr.search``.
     """
 
     def __init__(self, decoded, next_page_query=None):
@@ -295,6 +425,8 @@ class Results(object):
         self.qtime = decoded.get("responseHeader", {}).get("QTime", None)
         self.grouped = decoded.get("grouped", {})
         self.nextCursorMark = decoded.get("nextCursorMark", None)
+        self.request_bytes = None
+        self.response_bytes = None
         self._next_page_query = (
             self.nextCursorMark is not None and next_page_query or None
         )
@@ -318,7 +450,9 @@ class Solr(object):
     The main object for working with Solr.
 
     Optionally accepts ``decoder`` for an alternate JSON decoder instance.
-    Default is ``json.JSONDecoder()``.
+    Default is ``BytesJSONDecoder()``, with ``orjson`` when installed. Search
+    responses are passed as bytes to decoders with a true ``accepts_bytes``,
+    other decoders get strings.
 
     Optionally accepts ``encoder`` for an alternate JSON Encoder instance.
     Default is ``json.JSONEncoder()``.
@@ -330,6 +464,22 @@ class Solr(object):
     returned by ``.search()`` and ``.more_like_this()`` methods.
     Default is ``pysolr.Results``.
 
+    Optionally accepts ``pool_connections``, ``pool_maxsize`` and
+    ``pool_block`` for the connection pools of the session, see
+    ``requests.adapters.HTTPAdapter``. Default is ``10``, ``10`` and ``False``,
+    size ``pool_maxsize`` by the number of threads sharing the client, so
+    connections are kept alive instead of discarded.
+
+    Optionally accepts ``accept_gzip`` to ask for gzip compressed responses.
+    Default is ``True``.
+
+    Optionally accepts ``gzip_updates`` to send update bodies gzip compressed,
+    Solr has to inflate request bodies. Default is ``False``.
+
+    Optionally accepts ``stream_updates`` to encode the JSON documents of
+    ``.add()`` while they are sent as a chunked request body, so the message
+    of a batch is never held in memory. Default is ``True``.
+
     Usage::
 
         solr = pysolr.Solr('http://localhost:8983/solr')
@@ -354,8 +504,14 @@ class Solr(object):
         auth=None,
         verify=True,
         session=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        accept_gzip=True,
+        gzip_updates=False,
+        stream_updates=True,
     ):
-        self.decoder = decoder or json.JSONDecoder()
+        self.decoder = decoder or BytesJSONDecoder()
         self.encoder = encoder or json.JSONEncoder()
         self.url = url
         self.timeout = timeout
@@ -367,14 +523,55 @@ class Solr(object):
         self.auth = auth
         self.verify = verify
         self.always_commit = always_commit
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.accept_gzip = accept_gzip
+        self.gzip_updates = gzip_updates
+        self.stream_updates = stream_updates
+        # Transfer sizes of the last request of each thread
+        self._transfer = threading.local()
 
     def get_session(self):
         if self.session is None:
             self.session = requests.Session()
             self.session.stream = False
             self.session.verify = self.verify
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+                pool_block=self.pool_block,
+            )
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            # requests asks for gzip and deflate by default, identity turns compression off
+            self.session.headers["Accept-Encoding"] = (
+                "gzip" if self.accept_gzip else "identity"
+            )
         return self.session
 
+    def transport_stats(self):
+        """
+        Returns the requests sent and the connections opened by the pools of
+        the session. Requests on kept alive connections are ``reused``.
+        """
+        requests_sent = connections = 0
+        if self.session is not None:
+            for adapter in set(getattr(self.session, "adapters", {}).values()):
+                pools = getattr(adapter, "poolmanager", None)
+                if pools is None:
+                    continue
+                for key in pools.pools.keys():
+                    pool = pools.pools.get(key)
+                    if pool is not None:
+                        requests_sent += pool.num_requests
+                        connections += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "connections": connections,
+            "reused": max(requests_sent - connections, 0),
+        }
+
     def _get_log(self):
         return LOG
 
@@ -385,7 +582,13 @@ class Solr(object):
         # No path? No problem.
         return self.url
 
-    def _send_request(self, method, path="", body=None, headers=None, files=None):
+    def _send_request(
+        self, method, path="", body=None, headers=None, files=None, raw=False
+    ):
+        """
+        Sends a request and returns the response body as a string, or as the
+        received bytes with ``raw``.
+        """
         url = self._create_full_url(path)
         method = method.lower()
         log_body = body
@@ -417,7 +620,7 @@ class Solr(object):
         # encoded to bytes to work properly on Py3.
         bytes_body = body
 
-        if bytes_body is not None:
+        if bytes_body is not None and not isinstance(body, StreamBody):
             bytes_body = force_bytes(body)
         try:
             resp = requests_method(
@@ -427,7 +630,9 @@ class Solr(object):
                 files=files,
                 timeout=self.timeout,
                 auth=self.auth,
+                stream=True,
             )
+            response_bytes = self._read_content(resp)
         except requests.exceptions.Timeout as err:
             error_message = "Connection to server '%s' timed out: %s"
             self.log.exception(error_message, url, err)  # NOQA: G200
@@ -436,12 +641,18 @@ class Solr(object):
             error_message = "Failed to connect to server at %s: %s"
             self.log.exception(error_message, url, err)  # NOQA: G200
             raise SolrError(error_message % (url, err))
-        except HTTPException as err:
+        except (HTTPException, urllib3.exceptions.HTTPError, zlib.error) as err:
             error_message = "Unhandled error: %s %s: %s"
             self.log.exception(error_message, method, url, err)  # NOQA: G200
             raise SolrError(error_message % (method, url, err))
 
         end_time = time.time()
+        if isinstance(bytes_body, StreamBody):
+            body_bytes = bytes_body.sent_bytes
+        else:
+            body_bytes = len(bytes_body) if bytes_body is not None else 0
+        self._transfer.request_bytes = len(force_bytes(url)) + body_bytes
+        self._transfer.response_bytes = response_bytes
         self.log.info(
             "Finished '%s' (%s) with body '%s' in %0.3f seconds, with status %s",
             url,
@@ -469,13 +680,57 @@ class Solr(object):
             )
             raise SolrError(error_message % (resp.status_code, solr_message))
 
+        if raw:
+            return resp.content
         return force_unicode(resp.content)
 
+    def _read_content(self, resp):
+        """
+        Reads the response body as sent and keeps the decoded body as
+        ``resp.content``. Returns the bytes read, compressed bodies count
+        their compressed size. The connection goes back to the pool after a
+        complete read and is closed after a failed one, a read timeout is
+        raised as ``requests.exceptions.ReadTimeout``.
+        """
+        try:
+            sent = b"".join(resp.raw.stream(READ_CHUNK, decode_content=False))
+            resp._content = decode_content(sent, resp.headers.get("Content-Encoding"))
+            resp._content_consumed = True
+        except urllib3.exceptions.ReadTimeoutError as err:
+            raise requests.exceptions.ReadTimeout(err, request=resp.request)
+        finally:
+            resp.close()
+        return len(sent)
+
+    def last_transfer(self):
+        """
+        Returns ``(request_bytes, response_bytes)`` of the last request sent by
+        the calling thread, or ``(None, None)`` before its first request.
+
+        Request bytes count the URL and the body, response bytes the response
+        body as read from the connection, before gzip decoding.
+        """
+        return (
+            getattr(self._transfer, "request_bytes", None),
+            getattr(self._transfer, "response_bytes", None),
+        )
+
     def _select(self, params, handler=None):
         """
         :param params:
         :param handler: defaults to self.search_handler (fallback to 'select')
-        :return:
+        :return: the response as bytes when the decoder accepts bytes
+        """
+        return self._send_request(
+            *self._select_request(params, handler), raw=self._decodes_bytes()
+        )
+
+    def _decodes_bytes(self):
+        return getattr(self.decoder, "accepts_bytes", False)
+
+    def _select_request(self, params, handler=None):
+        """
+        Builds the ``(method, path, body, headers)`` of a select request.
         """
         # specify json encoding of results
         params["wt"] = "json"
@@ -492,16 +747,14 @@ class Solr(object):
         if len(params_encoded) < 1024:
             # Typical case.
             path = "%s/?%s" % (handler, params_encoded)
-            return self._send_request("get", path)
+            return "get", path, None, None
         else:
             # Handles very long queries by submitting as a POST.
             path = "%s/" % handler
             headers = {
                 "Content-type": "application/x-www-form-urlencoded; charset=utf-8"
             }
-            return self._send_request(
-                "post", path, body=params_encoded, headers=headers
-            )
+            return "post", path, params_encoded, headers
 
     def _mlt(self, params, handler="mlt"):
         return self._select(params, handler)
@@ -521,6 +774,7 @@ class Solr(object):
         handler="update",
         solrapi="XML",
         min_rf=None,
+        commitWithin=None,
     ):
         """
         Posts the given xml or json message to http://<self.url>/update and
@@ -530,6 +784,43 @@ class Solr(object):
         of control characters (default True). This is done by default because
         these characters would cause Solr to fail to parse the XML. Only pass
         False if you're positive your data is clean.
+
+        ``commitWithin`` is passed as a request parameter, which is the only
+        way to set it for JSON messages.
+        """
+        return self._send_request(
+            *self._update_request(
+                message,
+                clean_ctrl_chars=clean_ctrl_chars,
+                commit=commit,
+                softCommit=softCommit,
+                waitFlush=waitFlush,
+                waitSearcher=waitSearcher,
+                overwrite=overwrite,
+                handler=handler,
+                solrapi=solrapi,
+                min_rf=min_rf,
+                commitWithin=commitWithin,
+            )
+        )
+
+    def _update_request(
+        self,
+        message,
+        clean_ctrl_chars=True,
+        commit=None,
+        softCommit=False,
+        waitFlush=None,
+        waitSearcher=None,
+        overwrite=None,
+        handler="update",
+        solrapi="XML",
+        min_rf=None,
+        commitWithin=None,
+    ):
+        """
+        Builds the ``(method, path, body, headers)`` of an update request with
+        the arguments of ``_update``.
         """
 
         # Per http://wiki.apache.org/solr/UpdateXmlMessages, we can append a
@@ -563,27 +854,35 @@ class Solr(object):
         if waitSearcher is not None:
             query_vars.append("waitSearcher=%s" % str(bool(waitSearcher)).lower())
 
+        if commitWithin is not None:
+            query_vars.append("commitWithin=%i" % int(commitWithin))
+
         if query_vars:
             path = "%s?%s" % (path, "&".join(query_vars))
 
-        # Clean the message of ctrl characters.
-        if clean_ctrl_chars:
+        # Clean the message of ctrl characters, streamed messages are cleaned while built.
+        if clean_ctrl_chars and not isinstance(message, StreamBody):
             message = sanitize(message)
 
         if solrapi == "XML":
-            return self._send_request(
-                "post", path, message, {"Content-type": "text/xml; charset=utf-8"}
-            )
+            headers = {"Content-type": "text/xml; charset=utf-8"}
         elif solrapi == "JSON":
-            return self._send_request(
-                "post",
-                path,
-                message,
-                {"Content-type": "application/json; charset=utf-8"},
-            )
+            headers = {"Content-type": "application/json; charset=utf-8"}
         else:
             raise ValueError("unknown solrapi {}".format(solrapi))
 
+        if self.gzip_updates:
+            if isinstance(message, StreamBody):
+                chunks = message.chunks
+                message = StreamBody(
+                    lambda: _gzip_chunks(chunks()), message.buffer_size
+                )
+            else:
+                message = gzip.compress(force_bytes(message))
+            headers["Content-Encoding"] = "gzip"
+
+        return "post", path, message, headers
+
     def _extract_error(self, resp):
         """
         Extract the actual error message from a solr response.
@@ -835,6 +1134,18 @@ class Solr(object):
         params = {"q": q}
         params.update(kwargs)
         response = self._select(params, handler=search_handler)
+        results = self._search_results(params, search_handler, response)
+
+        if isinstance(results, Results):
+            results.request_bytes, results.response_bytes = self.last_transfer()
+
+        return results
+
+    def _search_results(self, params, search_handler, response, paging=True):
+        """
+        Decodes a search response to ``self.results_cls``. With ``paging`` the
+        results of a cursorMark search fetch the next page when iterated.
+        """
         decoded = self.decoder.decode(response)
 
         self.log.debug(
@@ -844,7 +1155,7 @@ class Solr(object):
         )
 
         cursorMark = params.get("cursorMark", None)
-        if cursorMark != decoded.get("nextCursorMark", cursorMark):
+        if paging and cursorMark != decoded.get("nextCursorMark", cursorMark):
 
             def next_page_query():
                 nextParams = params.copy()
@@ -919,7 +1230,9 @@ class Solr(object):
         )
         return res
 
-    def _build_docs(self, docs, boost=None, fieldUpdates=None, commitWithin=None):
+    def _build_docs(
+        self, docs, boost=None, fieldUpdates=None, commitWithin=None, clean_ctrl_chars=False
+    ):
         # if no boost needed use json multidocument api
         #   The JSON API skips the XML conversion and speedup load from 15 to 20 times.
         #   CPU Usage is drastically lower.
@@ -932,12 +1245,10 @@ class Solr(object):
                 message = [message]
                 # json array of docs
             if isinstance(message, list):
-                # convert to string
-                cleaned_message = [
-                    self._build_json_doc(doc, fieldUpdates=fieldUpdates)
-                    for doc in message
-                ]
-                m = self.encoder.encode(cleaned_message).encode("utf-8")
+                # convert to bytes
+                m = b"".join(
+                    self._json_docs_chunks(message, fieldUpdates, clean_ctrl_chars)
+                )
             else:
                 raise ValueError("wrong message type")
         else:
@@ -958,7 +1269,21 @@ class Solr(object):
 
         return (solrapi, m, len(message))
 
-    def _build_json_doc(self, doc, fieldUpdates=None):
+    def _json_docs_chunks(self, docs, fieldUpdates=None, clean_ctrl_chars=False):
+        """
+        Yields the UTF-8 JSON array of ``docs`` one document at a time, so a
+        batch is encoded without building the whole message.
+        """
+        yield b"["
+        for i, doc in enumerate(docs):
+            if i:
+                yield b","
+            yield self.encoder.encode(
+                self._build_json_doc(doc, fieldUpdates, clean_ctrl_chars)
+            ).encode("utf-8")
+        yield b"]"
+
+    def _build_json_doc(self, doc, fieldUpdates=None, clean_ctrl_chars=False):
         if fieldUpdates is None:
             cleaned_doc = {k: v for k, v in doc.items() if not self._is_null_value(v)}
         else:
@@ -969,6 +1294,16 @@ class Solr(object):
                 for k, v in doc.items()
             }
 
+        if clean_ctrl_chars:
+            # JSON escapes control characters, so they are removed from the values
+            for k, v in cleaned_doc.items():
+                if isinstance(v, str):
+                    cleaned_doc[k] = strip_ctrl_chars(v)
+                elif isinstance(v, (list, tuple)):
+                    cleaned_doc[k] = [
+                        strip_ctrl_chars(i) if isinstance(i, str) else i for i in v
+                    ]
+
         return cleaned_doc
 
     def _build_xml_doc(self, doc, boost=None, fieldUpdates=None):
@@ -1074,19 +1409,32 @@ class Solr(object):
                 },
             ])
         """
-        start_time = time.time()
-        self.log.debug("Starting to build add request...")
-        solrapi, m, len_message = self._build_docs(
-            docs, boost, fieldUpdates, commitWithin
-        )
-        end_time = time.time()
-        self.log.debug(
-            "Built add request of %s docs in %0.2f seconds.",
-            len_message,
-            end_time - start_time,
-        )
+        if boost is None and self.stream_updates:
+            # JSON documents are encoded and cleaned while the request is sent
+            if isinstance(docs, dict):
+                docs = [docs]
+            if not isinstance(docs, list):
+                raise ValueError("wrong message type")
+            solrapi = "JSON"
+            m = StreamBody(
+                lambda: self._json_docs_chunks(docs, fieldUpdates, clean_ctrl_chars=True)
+            )
+        else:
+            start_time = time.time()
+            self.log.debug("Starting to build add request...")
+            solrapi, m, len_message = self._build_docs(
+                docs, boost, fieldUpdates, commitWithin, clean_ctrl_chars=True
+            )
+            end_time = time.time()
+            self.log.debug(
+                "Built add request of %s docs in %0.2f seconds.",
+                len_message,
+                end_time - start_time,
+            )
         return self._update(
             m,
+            # JSON values are cleaned while encoded, XML messages after
+            clean_ctrl_chars=solrapi == "XML",
             commit=commit,
             softCommit=softCommit,
             waitFlush=waitFlush,
@@ -1095,6 +1443,8 @@ class Solr(object):
             handler=handler,
             solrapi=solrapi,
             min_rf=min_rf,
+            # The XML message carries commitWithin as an attribute, JSON messages need the request parameter
+            commitWithin=commitWithin if solrapi == "JSON" else None,
         )
 
     def delete(
@@ -1328,6 +1678,177 @@ class Solr(object):
             )
 
 
+class _AsyncResponse(object):
+    """
+    Response read by ``AsyncSolr``, with the attributes of a ``requests``
+    response used by ``Solr._extract_error``.
+    """
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(force_unicode(self.content))
+
+
+class AsyncSolr(Solr):
+    """
+    asyncio client with the ``search``, ``add``, ``delete``, ``commit`` and
+    ``optimize`` methods of ``Solr`` as coroutines, built on ``aiohttp``.
+
+    Requests are built and responses decoded by the ``Solr`` methods, only
+    sending is asynchronous. All requests share one session with a pool of at
+    most ``pool_size`` connections, so one event loop can keep many requests in
+    flight without a thread per request. Call ``close`` or use ``async with``
+    to release the connections.
+
+    Results of cursorMark searches are not paged when iterated, search again
+    with their ``nextCursorMark``.
+
+    Usage::
+
+        async with pysolr.AsyncSolr('http://localhost:8983/solr/core') as solr:
+            results = await asyncio.gather(*(solr.search(q) for q in queries))
+            await solr.add([{"id": "doc_1"}], commit=True)
+
+    """
+
+    def __init__(self, url, *args, pool_size=100, **kwargs):
+        super(AsyncSolr, self).__init__(url, *args, **kwargs)
+        self.pool_size = pool_size
+
+        if aiohttp is None and self.session is None:
+            logging.error("AsyncSolr requires the `aiohttp` library to be installed")
+            raise RuntimeError
+
+    def get_session(self):
+        if self.session is None:
+            connector_args = {"limit": self.pool_size}
+            if not self.verify:
+                connector_args["ssl"] = False
+            auth = self.auth
+            if isinstance(auth, tuple):
+                auth = aiohttp.BasicAuth(*auth)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(**connector_args),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                auth=auth,
+                auto_decompress=False,
+                headers={
+                    "Accept-Encoding": "gzip" if self.accept_gzip else "identity"
+                },
+            )
+        return self.session
+
+    async def _request(self, method, path="", body=None, headers=None, raw=False):
+        """
+        Sends a request and returns ``(response, request_bytes, response_bytes)``,
+        the response as bytes with ``raw``.
+        """
+        url = self._create_full_url(path)
+        method = method.lower()
+        if isinstance(body, StreamBody):
+            bytes_body = b"".join(body)
+        else:
+            bytes_body = force_bytes(body) if body is not None else None
+
+        self.log.debug("Starting request to '%s' (%s)...", url, method)
+        start_time = time.time()
+
+        session = self.get_session()
+
+        try:
+            async with session.request(
+                method.upper(), url, data=bytes_body, headers=headers or {}
+            ) as resp:
+                sent = await resp.read()
+                content = decode_content(sent, resp.headers.get("Content-Encoding"))
+                response = _AsyncResponse(resp.status, resp.headers, content)
+        except asyncio.TimeoutError as err:
+            error_message = "Connection to server '%s' timed out: %s"
+            self.log.exception(error_message, url, err)  # NOQA: G200
+            raise SolrError(error_message % (url, err))
+        except aiohttp.ClientConnectionError as err:
+            error_message = "Failed to connect to server at %s: %s"
+            self.log.exception(error_message, url, err)  # NOQA: G200
+            raise SolrError(error_message % (url, err))
+        except (aiohttp.ClientError, zlib.error) as err:
+            error_message = "Unhandled error: %s %s: %s"
+            self.log.exception(error_message, method, url, err)  # NOQA: G200
+            raise SolrError(error_message % (method, url, err))
+
+        end_time = time.time()
+        self.log.info(
+            "Finished '%s' (%s) in %0.3f seconds, with status %s",
+            url,
+            method,
+            end_time - start_time,
+            response.status_code,
+        )
+
+        if int(response.status_code) != 200:
+            error_message = "Solr responded with an error (HTTP %s): %s"
+            solr_message = self._extract_error(response)
+            self.log.error(
+                error_message,
+                response.status_code,
+                solr_message,
+                extra={
+                    "data": {
+                        "headers": response.headers,
+                        "response": response.content,
+                        "request_body": bytes_body,
+                        "request_headers": headers,
+                    }
+                },
+            )
+            raise SolrError(error_message % (response.status_code, solr_message))
+
+        request_bytes = len(force_bytes(url)) + (
+            len(bytes_body) if bytes_body is not None else 0
+        )
+        return content if raw else force_unicode(content), request_bytes, len(sent)
+
+    async def _send_request(
+        self, method, path="", body=None, headers=None, files=None, raw=False
+    ):
+        if files is not None:
+            raise SolrError("AsyncSolr does not send files")
+
+        response, _, _ = await self._request(method, path, body, headers, raw)
+        return response
+
+    async def search(self, q, search_handler=None, **kwargs):
+        """
+        Performs a search and returns the results, see ``Solr.search``.
+        """
+        params = {"q": q}
+        params.update(kwargs)
+        response, request_bytes, response_bytes = await self._request(
+            *self._select_request(params, handler=search_handler),
+            raw=self._decodes_bytes()
+        )
+        results = self._search_results(params, search_handler, response, paging=False)
+
+        if isinstance(results, Results):
+            results.request_bytes, results.response_bytes = request_bytes, response_bytes
+
+        return results
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
 class SolrCoreAdmin(object):
     """
     Handles core admin operations: see http://wiki.apache.org/solr/CoreAdmin
@@ -1466,11 +1987,12 @@ REPLACEMENTS = (
 )
 
 
-def sanitize(data):
-    fixed_string = force_bytes(data)
+# All replaced characters are removed, so one translate pass deletes them
+CONTROL_BYTES = b"".join(bad for bad, good in REPLACEMENTS)
 
-    for bad, good in REPLACEMENTS:
-        fixed_string = fixed_string.replace(bad, good)
+
+def sanitize(data):
+    fixed_string = force_bytes(data).translate(None, CONTROL_BYTES)
 
     return force_unicode(fixed_string)
 
@@ -1509,11 +2031,13 @@ class SolrCloud(Solr):
             **kwargs
         )
 
-    def _send_request(self, method, path="", body=None, headers=None, files=None):
+    def _send_request(
+        self, method, path="", body=None, headers=None, files=None, raw=False
+    ):
         for retry_number in range(0, self.retry_count):
             try:
                 self.url = self.zookeeper.getRandomURL(self.collection)
-                return Solr._send_request(self, method, path, body, headers, files)
+                return Solr._send_request(self, method, path, body, headers, files, raw)
             except (SolrError, requests.exceptions.RequestException):
                 LOG.exception(
                     "%s %s failed on retry %s, will retry after %0.1fs",
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# Caches of each core, writes to a core clear the caches of every client of it
+_CORE_CACHES = {}
+_registry_lock = threading.Lock()
+
+# Normalized query, whitespace is collapsed so queries differing only in spacing share an entry. Case is kept,
+# as Solr operators and non analyzed fields are case sensitive
+def normalizeQuery(query):
+    return " ".join(query.split())
+
+# LRU cache of search results with a max number of entries and a time to live in seconds, entries older than ttl are misses.
+# Counts hits, misses, evictions by size, expired entries and invalidations
+class ResultCache():
+    def __init__(self, size, ttl = None):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats(reset = True)
+
+    def key(self, query, params):
+        return (normalizeQuery(query), tuple(sorted((name, str(value)) for name, value in params.items())))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if(entry != None and self.ttl != None and time.monotonic() - entry[0] > self.ttl):
+                del self.entries[key]
+                self.counters["expired"] += 1
+                entry = None
+            if(entry == None):
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            if(len(self.entries) > 0):
+                self.counters["invalidations"] += 1
+            self.entries.clear()
+
+    # Counters since the last reset with the current number of entries
+    def stats(self, reset = False):
+        with self.lock:
+            stats = None if reset else dict(self.counters, entries=len(self.entries))
+            if(reset):
+                self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+        return stats
+
+def registerCache(core, cache):
+    with _registry_lock:
+        _CORE_CACHES.setdefault(core, weakref.WeakSet()).add(cache)
+
+# Clear the caches of a core after its documents changed
+def invalidateCore(core):
+    with _registry_lock:
+        caches = list(_CORE_CACHES.get(core, ()))
+    for cache in caches:
+        cache.clear()
@@ -1,14 +1,54 @@
 #!/usr/bin/env python3
 
 import json
-import pandas as pd
 import logging
-from solr.lib.pysolr  import (Solr as SolrClient, SolrCoreAdmin)
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from solr.lib.pysolr  import (Solr as SolrClient, SolrCoreAdmin, BytesJSONDecoder)
+from solr.bulk_indexer import BulkIndexer
+from solr.result_cache import (ResultCache, registerCache, invalidateCore, normalizeQuery)
+from testing.corpus_cache import openCorpus
+from testing.batching import (BatchSizer, BATCH_BYTES, BATCH_MAX_DOCS, LUCENE_LIMIT)
 
 LOG = logging.getLogger("_solr_")
 
-LUCENE_LIMIT = 32766 # Lucene term limit of 32766 bytes
-TITLE_PARTITION_PROCENT = 0.1 # Partition size 10%
+# Commit after every partition, commitWithin milliseconds, soft commit after every partition or one hard commit after the last partition
+COMMIT_STRATEGIES = ("batch", "within", "soft", "final")
+COMMIT_WITHIN = 1000 # Default commitWithin milliseconds
+# Text search with a phrase and a term request one after another, both requests at once,
+# one request of the boosted phrase or the terms, or one edismax request of the terms with a phrase field boost
+SEARCH_MODES = ("sequential", "parallel", "combined", "edismax")
+PHRASE_BOOST = 2 # Boost of phrase matches over term matches in one request modes
+SEARCH_WORKERS = 32 # Threads sending the phrase requests of the parallel mode
+SEARCH_FIELDS = "id,title" # Returned fields, only ids and titles of hits are used so stored texts are not transferred
+SEARCH_ROWS = 10
+CURSOR_SORT = "score desc,id asc" # Cursor paging needs a sort ending with the unique key
+# HTTP transport of the clients, pool sizes of requests, gzip responses and optionally gzip update bodies
+HTTP_DEFAULTS = {"pool_connections": 10, "pool_maxsize": 10, "pool_block": False, "accept_gzip": True, "gzip_updates": False}
+WHITESPACE_BYTES = (b" ", b"\n", b"\t", b"\r", b"\x0b", b"\x0c")
+
+# Split text to parts of less than limit UTF-8 bytes. The text is encoded once and cut at the last ASCII whitespace
+# before the limit, or at the last character boundary when a part has no whitespace, so the parts are decoded slices
+def partitionText(text, limit = LUCENE_LIMIT):
+    if(limit <= 4):
+        raise ValueError("Limit {} is not larger than the longest UTF-8 character".format(limit))
+    data = text.encode("utf-8")
+    parts = []
+    start = 0
+    while len(data) - start >= limit:
+        end = start + limit - 1
+        # Continuation bytes are 10xxxxxx, a character starts at the first other byte
+        while (data[end] & 0xC0) == 0x80:
+            end -= 1
+        space = max(data.rfind(whitespace, start + 1, end + 1) for whitespace in WHITESPACE_BYTES)
+        if(space > start):
+            end = space
+        parts.append(data[start:end].decode("utf-8"))
+        start = end
+    parts.append(data[start:].decode("utf-8"))
+
+    return parts
 
 class Solr:
 
@@ -17,175 +57,196 @@ class Solr:
         self.host = client["solr_host"]
         self.port = client["solr_port"]
         self.core = config["core"]
+        self.commit = config.get("commit", "batch")
+        self.commit_within = config.get("commit_within", COMMIT_WITHIN)
+        # Parallel update requests while indexing, one worker sends partitions serially
+        self.index_workers = config.get("index_workers", 1)
+        # Partitions are bounded by payload bytes and docs, adaptive batching tunes the bytes by update throughput
+        self.batch_bytes = config.get("batch_bytes", BATCH_BYTES)
+        self.batch_docs = config.get("batch_docs", BATCH_MAX_DOCS)
+        self.adaptive_batching = config.get("adaptive_batching", False)
+        # Adaptive batches shrink when an update request takes longer than the milliseconds
+        self.batch_max_latency = config.get("batch_max_latency")
+        self.http = dict(HTTP_DEFAULTS, **(config.get("http") or {}))
+        # Search responses are decoded from the received bytes, with orjson when installed or json
+        self.decoder = BytesJSONDecoder(config.get("json_decoder", "auto"))
+        self.transport_start = None
+        if(self.commit not in COMMIT_STRATEGIES):
+            raise ValueError("Unknown commit strategy {}, use one of {}".format(self.commit, COMMIT_STRATEGIES))
+        # Client and search executor are created before query workers share them, threads of the executor start on first use
         self.client = None
+        self._initClient()
+        self.executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS)
+        self.result_cache = None
+        self.transfer_lock = threading.Lock()
+        self.transferStats(reset = True)
+        self.setSearchParams(config)
 
     def _get_log(self):
         return LOG
 
+    def _url(self):
+        return "http://{}:{}/solr/{}".format(self.host, self.port, self.core)
+
     # Initialize Solr API client for a specific core
     def _initClient(self):
         try:
             self.log.info("    Initializing Solr client with host {} port {} core {}".format(self.host, self.port, self.core))
-            self.client = SolrClient("http://{}:{}/solr/{}".format(self.host, self.port, self.core))
+            self.client = SolrClient(self._url(), decoder = self.decoder, **self.http)
         except Exception as ex:
             self.log.exception("    " + str(ex) )
 
-    # Search 
-    def _search(self, query, timer):
+    # Search, failed requests are logged and raised so query tests count them as errors
+    def _search(self, query, **params):
         if(self.client == None):
             self._initClient()
         if(self.core == None):
             self.core = "default"
-        if(timer != None):
-            timer.start()
 
-        try:
-            results = self.client.search(query)
-            similar_titles =  [(doc["id"], doc['title']) for doc in results.docs]
+        params = dict(self.query_params, **params)
+        cache_key = None
+        if(self.result_cache != None):
+            cache_key = self.result_cache.key(query, params)
+            cached = self.result_cache.get(cache_key)
+            if(cached != None):
+                self.log.info("    Search results from cache: {}".format(cached))
+                return list(cached)
 
-            # Mesure query elapsed time
-            if(timer != None):
-                timer.stop()
-                self.log.info("    Query elapsed time: {}".format(timer.info()))
+        try:
+            results = self.client.search(query, **params)
+            docs = list(results.docs)
+            request_count = 1
+            request_bytes = results.request_bytes
+            response_bytes = results.response_bytes
+            # Deep paging follows the cursor until the last page or the page limit
+            while(self.cursor and request_count < self.pages and results.nextCursorMark not in (None, params["cursorMark"])):
+                params["cursorMark"] = results.nextCursorMark
+                results = self.client.search(query, **params)
+                docs += results.docs
+                request_count += 1
+                request_bytes += results.request_bytes
+                response_bytes += results.response_bytes
+
+            self._recordTransfer(request_count, request_bytes, response_bytes)
+            self.log.info("    Search transfer: requests {} request {} bytes response {} bytes".format(request_count, request_bytes, response_bytes))
+            similar_titles =  [(doc["id"], doc.get('title')) for doc in docs]
             self.log.info("    Search results: {}".format(similar_titles))
+            if(cache_key != None):
+                self.result_cache.put(cache_key, similar_titles)
 
             return similar_titles
         except Exception as ex:
             self.log.exception("    " + str(ex) )
+            raise
+
+    # Commit parameters of a partition add by the commit strategy
+    def _commitParams(self):
+        if(self.commit == "batch"):
+            return {"commit": True}
+        elif(self.commit == "within"):
+            return {"commit": False, "commitWithin": self.commit_within}
+        elif(self.commit == "soft"):
+            return {"commit": False, "softCommit": True}
+
+        return {"commit": False}
+
+    # Add a partition of documents to the core, or queue it to the bulk indexer
+    def _addDocs(self, docs, size, count, doc_count, progress, sizer, indexer = None):
+        self.log.info("    Adding doc partition of size {} ({} bytes) {}/{}".format(len(docs), size, count, doc_count))
+        try:
+            if(indexer != None):
+                indexer.submit(docs, count)
+                progress.print(indexer.completed)
+            else:
+                time_start = time.perf_counter()
+                self.client.add(docs=docs, **self._commitParams())
+                sizer.observe(len(docs), size, time.perf_counter() - time_start)
+                progress.print(count)
+        except Exception as ex:
+            self.log.exception("    " + str(ex) )
 
-            return []
-
-    def _findLastWhiteSpace(self, string, iFrom, iTo):
-        i = iFrom 
-        while i > iTo:
-            if(string[i].isspace()):
-                return i
-            i-=1
-
-        return 0
-    
-    # Try splitings string by white spaces and max sequence length
-    def _partitionString(self,string, max):
-        splits = []
-        all_count = len(bytes(string.encode("utf-8")))
-        byte_count = 0
-        iFrom = 0   
-        i = 0
-
-        while i < len(string):
-            c = string[i]
-            byte_char_count = len(bytes(c.encode("utf-8")))
-
-            if(byte_count+byte_char_count >= max):
-                byte_count = 0
-                last_space = self._findLastWhiteSpace(string, i, iFrom)
-                if(last_space > 0):
-                    splits.append((iFrom, last_space))
-                    i = last_space
-                    iFrom = last_space
-                else:
-                    splits.append((iFrom, i))
-                    iFrom = i
-
-            byte_count += byte_char_count
-            i += 1
-        
-        splits.append((iFrom, all_count+1))
-
-        return splits
-
-    # Insert documents to core
-    def _indexData(self, docs, progress,  use_partition):
-        doc_count = len(docs)
+    # Insert documents to core, docs are (title, text) read lazily and added in partitions,
+    # so only one partition is in memory. With partitioning texts larger than the lucene limit are split to multiple docs
+    def _indexData(self, docs, doc_count, progress,  use_partition):
         progress.setMax(doc_count)
         progress.start()
 
-        if(use_partition):
-            partition_docs = []
-            count = 0
-
-            partition_size = int(doc_count * TITLE_PARTITION_PROCENT)
-            self.log.info("    Partitioning titles {} by {} with partition size {}".format(doc_count, TITLE_PARTITION_PROCENT, partition_size))
-
-            for doc in docs:
-                count += 1
-                # used to check if last docs got indexed
-                # Can't check if on last doc to index becuase the number of docs changes until end of for. Reason is spliting larger docs in multiple docs
-                last_indexed = False 
-
-
-                # Depending on the format docs can be a dict or array of dicts
-                if(isinstance(doc, str)):
-                    text = docs[doc]
-                    title = doc
-                else:
-                    text = doc["text"]
-                    title = doc["title"]
-
+        sizer = BatchSizer(self.batch_bytes, self.batch_docs, self.adaptive_batching,
+                           self.batch_max_latency / 1000 if self.batch_max_latency != None else None)
+        self.log.info("    Partitioning titles {} by {}".format(doc_count, sizer.describe()))
+        partition_docs = []
+        partition_bytes = 0
+        count = 0
+        indexer = None
+        if(self.index_workers > 1):
+            self.log.info("    Bulk indexing with {} workers".format(self.index_workers))
+            indexer = BulkIndexer(self._url(), self.index_workers, commit_params = self._commitParams(), sizer = sizer,
+                                  client_args = self.http, log = self.log)
+            indexer.start()
+
+        self.worker_stats = None
+        self.index_errors = 0
+        try:
+            for title, text in docs:
                 size = len(bytes(text, 'utf-8'))
 
                 # Check if text data size larger than lucene limit
-                if(size < LUCENE_LIMIT):
+                if(use_partition and size >= LUCENE_LIMIT):
+                    for i,part in enumerate(partitionText(text, LUCENE_LIMIT)):
+                        count += 1
+                        partition_docs.append({
+                            "id":count,
+                            "title":title+" part "+str(i),
+                            "text":part,
+                        })
+                        partition_bytes += len(bytes(title, 'utf-8')) + len(bytes(part, 'utf-8'))
+                else:
+                    count += 1
                     partition_docs.append({
                         "id":count,
                         "title":title,
                         "text":text,
                     })
-                else:
-                    for i,split in enumerate(self._partitionString(text, LUCENE_LIMIT)):
-                        last_indexed = False
-                        if(i>0):
-                            count += 1
+                    partition_bytes += len(bytes(title, 'utf-8')) + size
 
-                        partition_docs.append({
-                            "id":count,
-                            "title":title+" part "+str(i),
-                            "text":text[split[0]:split[1]],
-                        })
-                      
-                        if(count % partition_size == 0): 
-                            last_indexed = True
-                            self.log.info("    Adding doc partition of size {} {}/{}".format(len(partition_docs), count, doc_count ))                       
-                            try:
-                                self.client.add(docs=partition_docs, commit=True)
-                                progress.print(count)
-                            except Exception as ex:
-                                self.log.exception("    " + str(ex) )
-                            finally:
-                                partition_docs = []
-
-                if(count % partition_size == 0): 
-                    last_indexed = True
-                    self.log.info("    Adding doc partition of size {} {}/{}".format(len(partition_docs), count, doc_count))
-                    try:
-                        self.client.add(docs=partition_docs, commit=True)
-                        progress.print(count)
-                    except Exception as ex:
-                        self.log.exception("    " + str(ex) )  
-                    finally:
-                        partition_docs = []
+                if(sizer.full(len(partition_docs), partition_bytes)):
+                    self._addDocs(partition_docs, partition_bytes, count, doc_count, progress, sizer, indexer)
+                    partition_docs = []
+                    partition_bytes = 0
 
             # Do last partition after for if nedded
-            if(not last_indexed):
-                self.log.info("    Adding last docs {} {}/{}".format(len(partition_docs), count, doc_count))
-                try:
-                    self.client.add(docs=partition_docs, commit=True)
-                    progress.print(count)
-                except Exception as ex:
-                    self.log.exception("    " + str(ex) )  
-                finally:
-                    partition_docs = []
-                
-        else:
+            if(len(partition_docs) > 0):
+                self._addDocs(partition_docs, partition_bytes, count, doc_count, progress, sizer, indexer)
+        finally:
+            # Workers are stopped and joined also when reading the corpus or splitting a text fails, so the process can exit
+            if(indexer != None):
+                self.worker_stats = indexer.close()
+                self.index_errors = len(indexer.errors)
+                progress.print(indexer.completed)
+
+        self.batch_stats = sizer.stats()
+        if(self.adaptive_batching):
+            self.log.info("    Adaptive batch size ended at {} bytes after {} batches".format(sizer.target_bytes, sizer.batches))
+
+        if(self.commit == "final"):
+            self.log.info("    Final hard commit of {} docs".format(count))
             try:
-                self.log.info("    Adding docs {}".format(len(docs)))
-                self.client.add(docs=docs, commit=True)
-                progress.start(doc_count)
+                self.client.commit()
             except Exception as ex:
                 self.log.exception("    " + str(ex) )
-            
+        elif(self.commit in ("within", "soft")):
+            # Adds return before commitWithin or the last soft commit made the documents searchable. A soft commit waiting
+            # for the new searcher makes them visible inside the index time, so strategies index to the same searchable state
+            self.log.info("    Final soft commit of {} docs, waiting for the searcher".format(count))
+            try:
+                self.client.commit(softCommit=True, waitSearcher=True)
+            except Exception as ex:
+                self.log.exception("    " + str(ex) )
+
         progress.end()
 
+        return count
+
     # Initialize Solr core with CoreAdmin API
     def initCore(self):
         try:
@@ -201,41 +262,134 @@ class Solr:
         except Exception as ex:
             self.log.exception("    " + str(ex) )
 
-    # Read and index documents from corpus
-    def indexDocuments(self, file, format , progress, use_partition=False):
+    # Reload core with CoreAdmin API, the new searcher starts with empty query result, filter and document caches.
+    # Client result caches of the core are cleared too, so cold start queries are not answered from them
+    def reload(self):
+        invalidateCore(self._url())
+        try:
+            solr_admin = SolrCoreAdmin("http://{}:{}/solr/admin/cores".format(self.host, self.port))
+            self.log.info("    Reloading core with SolrCoreAdmin: http://{}:{}/solr/admin/cores {}".format(self.host, self.port, self.core))
+            response = solr_admin.reload(self.core)
+            self.log.info("    Reload response: " + response)
+        except Exception as ex:
+            self.log.exception("    " + str(ex) )
+
+    # Index size in bytes from the core status of the CoreAdmin API
+    def indexSize(self):
+        try:
+            solr_admin = SolrCoreAdmin("http://{}:{}/solr/admin/cores".format(self.host, self.port))
+            status = json.loads(solr_admin.status(self.core))
+
+            return status["status"][self.core]["index"]["sizeInBytes"]
+        except Exception as ex:
+            self.log.exception("    " + str(ex) )
+
+            return None
+
+    # Open the corpus to index, compiling the corpus cache when enabled, before the index time is measured
+    def prepareIndex(self, file, format, use_partition=False, cache=False):
+        return openCorpus(file, format, cache)
+
+    # Read and index documents from corpus, opened by prepareIndex when not given
+    def indexDocuments(self, file, format , progress, use_partition=False, cache=False, corpus=None):
         self.log.info("    Adding documents to index: {} {}".format(self.core, file))  
         if(self.client == None):
             self._initClient()
 
-        if(format == "CSV"):
-            data_not_filtered = pd.read_csv(file)
-            # String id field
-            data_not_filtered["id"] = data_not_filtered.index.astype(str)
-            data = data_not_filtered[['id', 'title', 'text']]
-            docs = json.loads(data.to_json(orient="records"))
+        if(corpus == None):
+            corpus = self.prepareIndex(file, format, use_partition, cache)
+        self.log.info("    Commit strategy: {} commitWithin: {}".format(self.commit, self.commit_within if self.commit == "within" else None))
+        self.transportStats(reset = True)
+        count = self._indexData(corpus.documents(), len(corpus), progress, use_partition)
+        invalidateCore(self._url())
+        transport = self.transportStats()
+        # Bulk index workers send with their own clients
+        for stats in self.worker_stats or []:
+            transport = {key: transport[key] + stats["transport"][key] for key in transport}
+        self.log.info("    Index transport: {}".format(transport))
+
+        return {"documents": count, "commit": self.commit, "commit_within": self.commit_within if self.commit == "within" else None,
+                "index_workers": self.index_workers, "worker_stats": self.worker_stats, "errors": self.index_errors, **self.batch_stats,
+                "gzip_updates": self.http["gzip_updates"], "transport": transport}
+
+    def _recordTransfer(self, requests, request_bytes, response_bytes):
+        with self.transfer_lock:
+            self.transfer["requests"] += requests
+            self.transfer["request_bytes"] += request_bytes
+            self.transfer["response_bytes"] += response_bytes
+
+    # Search requests and their bytes since the last reset
+    def transferStats(self, reset = False):
+        stats = None if reset else dict(self.transfer, json_decoder = self.decoder.backend)
+        if(reset):
+            self.transfer = {"requests": 0, "request_bytes": 0, "response_bytes": 0}
+
+        return stats
+
+    # Requests and opened connections of the client since the last reset, requests on kept alive connections are reused
+    def transportStats(self, reset = False):
+        if(self.client == None):
+            self._initClient()
+        current = self.client.transport_stats()
+        if(reset):
+            self.transport_start = current
+            return None
+        start = self.transport_start or {key: 0 for key in current}
+        stats = {key: current[key] - start[key] for key in ("requests", "connections")}
+        stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+
+        return stats
+
+    # Result cache counters since the last reset, None without a cache
+    def cacheStats(self, reset = False):
+        if(self.result_cache == None):
+            return None
 
-            self._indexData(docs, progress, use_partition)
-        elif(format == "JSON"):
-            with open(file, 'r') as json_file:
-                docs = json.load(json_file)
+        return self.result_cache.stats(reset)
 
-                self._indexData(docs, progress, use_partition)
+    def _startTimer(self, timer):
+        if(timer != None):
+            timer.start()
+
+    # Mesure query elapsed time, one time of all requests of a logical query
+    def _stopTimer(self, timer):
+        if(timer != None):
+            timer.stop()
+            self.log.info("    Query elapsed time: {}".format(timer.info()))
 
     # Search title field        
     def search(self, query, timer = None):
+        self._startTimer(timer)
+        query = normalizeQuery(query)
         self.log.info('    Searching: "{}" '.format(query))
-        if(self._search('title:"'+query+'"', timer) == []):
+        if(self._search('title:"'+query+'"') == []):
             self.log.info("    Searching: {} ".format(query))
-            self._search('title:'+query, timer)
+            self._search('title:'+query)
+        self._stopTimer(timer)
         
-    # Search text field
+    # Search text field, whitespace of the query is normalized so cached results are shared by queries differing in spacing
     def searchText(self, query, timer = None):
-        # try searching with and without quotation marks
-        self.log.info('    Searching: "{}" '.format(query))
-        self._search('text:"'+query+'"', timer)
+        self._startTimer(timer)
+        query = normalizeQuery(query)
+        if(self.search_mode == "combined"):
+            self.log.info('    Searching text: "{}"^{} OR {} '.format(query, self.phrase_boost, query))
+            self._search('text:"{}"^{} OR text:({})'.format(query, self.phrase_boost, query))
+        elif(self.search_mode == "edismax"):
+            self.log.info('    Searching text: {} with phrase boost {} '.format(query, self.phrase_boost))
+            self._search(query, defType="edismax", qf="text", pf="text^{}".format(self.phrase_boost))
+        elif(self.search_mode == "parallel"):
+            self.log.info('    Searching: "{}" and text: {} '.format(query, query))
+            phrase = self.executor.submit(self._search, 'text:"'+query+'"')
+            self._search('text:'+query)
+            phrase.result()
+        else:
+            # try searching with and without quotation marks
+            self.log.info('    Searching: "{}" '.format(query))
+            self._search('text:"'+query+'"')
 
-        self.log.info("    Searching text: {} ".format(query))
-        self._search('text:'+query, timer)
+            self.log.info("    Searching text: {} ".format(query))
+            self._search('text:'+query)
+        self._stopTimer(timer)
     
     # Clear core data
     def clear(self):
@@ -247,6 +401,39 @@ class Solr:
             self.client.delete(q="*:*", commit=True) 
         except Exception as ex:
             self.log.exception("    " + str(ex) )
+        invalidateCore(self._url())
 
     def drop(self):
-        pass
\ No newline at end of file
+        pass
+
+    # Change search parameters, used between query tests on the same indexed data
+    def setSearchParams(self, config):
+        search = config.get("search") or {}
+        self.search_mode = search.get("mode", "sequential")
+        self.phrase_boost = search.get("phrase_boost", PHRASE_BOOST)
+        # Returned fields and rows of a page, fl of None returns all stored fields
+        self.query_params = {"rows": search.get("rows", SEARCH_ROWS)}
+        fields = search.get("fl", SEARCH_FIELDS)
+        if(fields != None):
+            self.query_params["fl"] = fields
+        self.cursor = search.get("cursor", False)
+        self.pages = search.get("pages", 1)
+        if(self.cursor):
+            self.query_params["cursorMark"] = "*"
+            self.query_params["sort"] = search.get("sort", CURSOR_SORT)
+        else:
+            self.query_params["start"] = search.get("start", 0)
+
+        # Result cache of cache_size entries kept for cache_ttl seconds, cleared when documents of the core change.
+        # Every config starts with a new cache, so a config is not answered by results of the previous one
+        cache_size = search.get("cache_size", 0)
+        cache_ttl = search.get("cache_ttl", None)
+        if(self.result_cache != None):
+            self.result_cache.clear()
+        if(cache_size <= 0):
+            self.result_cache = None
+        else:
+            self.result_cache = ResultCache(cache_size, cache_ttl)
+            registerCache(self._url(), self.result_cache)
+        if(self.search_mode not in SEARCH_MODES):
+            raise ValueError("Unknown search mode {}, use one of {}".format(self.search_mode, SEARCH_MODES))
\ No newline at end of file
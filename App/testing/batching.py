@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+LUCENE_LIMIT = 32766 # Lucene term limit of 32766 bytes, bounds text parts of indexed documents
+BATCH_BYTES = 4 << 20 # Target payload of a batch
+BATCH_MAX_DOCS = 10000 # Upper bound of documents in a batch, bounds memory of corpora with small documents
+ADAPTIVE_MIN_BYTES = 256 << 10 # Bounds of the adaptive target payload
+ADAPTIVE_MAX_BYTES = 64 << 20
+ADAPTIVE_STEP = 1.5 # Factor the adaptive target grows or shrinks by after a batch
+ADAPTIVE_SMOOTHING = 0.5 # Weight of the last batch in the smoothed throughput
+ADAPTIVE_TOLERANCE = 0.05 # Throughput drop that reverses the direction of the adaptive target
+
+# Batch boundaries by payload bytes and document count, so batch size does not depend on the corpus size.
+# The adaptive sizer climbs the throughput of the observed requests: the target keeps moving in one direction while
+# throughput holds and turns when it drops, requests slower than max_latency seconds always shrink it
+class BatchSizer():
+    def __init__(self, target_bytes = BATCH_BYTES, max_docs = BATCH_MAX_DOCS, adaptive = False, max_latency = None,
+                 min_bytes = ADAPTIVE_MIN_BYTES, max_bytes = ADAPTIVE_MAX_BYTES):
+        self.initial_bytes = target_bytes
+        self.target_bytes = target_bytes
+        self.max_docs = max_docs
+        self.adaptive = adaptive
+        self.max_latency = max_latency
+        self.min_bytes = min(min_bytes, target_bytes)
+        self.max_bytes = max(max_bytes, target_bytes)
+        self.direction = 1
+        self.throughput = None
+        self.batches = 0
+
+    def full(self, docs, size):
+        return docs >= self.max_docs or size >= self.target_bytes
+
+    # Record sent batches of docs and size bytes which took seconds, adapting the target when enabled.
+    # Parallel senders observe several batches at once over the wall clock seconds they took together
+    # with the latency of their slowest request, by default the request latency is the seconds
+    def observe(self, docs, size, seconds, batches = 1, latency = None):
+        self.batches += batches
+        if(not self.adaptive or seconds <= 0):
+            return
+
+        throughput = size / seconds
+        if(self.throughput != None and throughput < self.throughput * (1 - ADAPTIVE_TOLERANCE)):
+            self.direction = -self.direction
+        self.throughput = throughput if self.throughput == None else ADAPTIVE_SMOOTHING * throughput + (1 - ADAPTIVE_SMOOTHING) * self.throughput
+        if(self.max_latency != None and (latency if latency != None else seconds) > self.max_latency):
+            self.direction = -1
+
+        target = self.target_bytes * ADAPTIVE_STEP if self.direction > 0 else self.target_bytes / ADAPTIVE_STEP
+        self.target_bytes = int(min(max(target, self.min_bytes), self.max_bytes))
+
+    def describe(self):
+        return "{} bytes and {} docs{}{}".format(self.target_bytes, self.max_docs, " adaptive" if self.adaptive else "",
+                                               " under {}s".format(self.max_latency) if self.adaptive and self.max_latency != None else "")
+
+    def stats(self):
+        return {"batch_bytes": self.initial_bytes, "batch_docs": self.max_docs, "adaptive": self.adaptive,
+                "max_latency": self.max_latency, "batches": self.batches, "final_batch_bytes": self.target_bytes}
+
+# Group documents to batches bounded by the sizer, size(doc) is the payload bytes of a document.
+# Batches are built lazily, so targets adapted after a batch apply to the next one
+def sizedBatches(docs, sizer, size):
+    batch = []
+    batch_bytes = 0
+    for doc in docs:
+        batch.append(doc)
+        batch_bytes += size(doc)
+        if(sizer.full(len(batch), batch_bytes)):
+            yield batch, batch_bytes
+            batch = []
+            batch_bytes = 0
+    if(len(batch) > 0):
+        yield batch, batch_bytes
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import copy
+import itertools
+import json
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# Config parts used only at search time, grid points differing only in them share one indexed state
+SEARCH_KEYS = ("index.search_params", "search", "workload")
+# Keys describing the test instead of the system configuration
+TEST_KEYS = ("system", "corpus", "client", "matrix", "workload")
+
+def _getPath(config, path):
+    value = config
+    for key in path.split("."):
+        if(not isinstance(value, dict) or key not in value):
+            return None
+        value = value[key]
+
+    return value
+
+def _setPath(config, path, value):
+    keys = path.split(".")
+    for key in keys[:-1]:
+        config = config.setdefault(key, {})
+    config[keys[-1]] = value
+
+def _deletePath(config, path):
+    keys = path.split(".")
+    for key in keys[:-1]:
+        if(not isinstance(config, dict) or key not in config):
+            return
+        config = config[key]
+    if(isinstance(config, dict)):
+        config.pop(keys[-1], None)
+
+# Read a YAML or JSON file, a file can hold one config or a list of them
+def readConfigFile(file):
+    with open(file, 'r', encoding='utf-8') as config_file:
+        if(file.endswith((".yaml", ".yml"))):
+            if(yaml == None):
+                raise RuntimeError("YAML configs require the PyYAML library, use a JSON config instead")
+            data = yaml.safe_load(config_file)
+        else:
+            data = json.load(config_file)
+
+    return data if isinstance(data, list) else [data]
+
+# Expand the matrix of a config to a config per combination of values.
+# Matrix keys are dotted paths in the config, for example index.search_params.nprobe: [1, 10, 64]
+def expandMatrix(config):
+    matrix = config.get("matrix") or {}
+    base = {key: value for key, value in config.items() if key != "matrix"}
+    if(len(matrix) == 0):
+        return [base]
+
+    paths = list(matrix.keys())
+    configs = []
+    for values in itertools.product(*(matrix[path] for path in paths)):
+        expanded = copy.deepcopy(base)
+        for path, value in zip(paths, values):
+            _setPath(expanded, path, value)
+        expanded["name"] = "{} {}".format(base.get("name", ""), " ".join("{}={}".format(path.split(".")[-1], value) for path, value in zip(paths, values))).strip()
+        configs.append(expanded)
+
+    return configs
+
+def loadConfigs(file):
+    configs = []
+    for config in readConfigFile(file):
+        configs += expandMatrix(config)
+
+    return configs
+
+# Config parts that require indexing, without search time parameters
+def indexKey(config):
+    indexed = {key: value for key, value in config.items() if key != "name"}
+    indexed = copy.deepcopy(indexed)
+    for path in SEARCH_KEYS:
+        _deletePath(indexed, path)
+
+    return json.dumps(indexed, sort_keys=True, default=str)
+
+# Group configs which can be queried on the same indexed state, groups keep the file order
+def groupByIndex(configs):
+    groups = {}
+    for config in configs:
+        groups.setdefault(indexKey(config), []).append(config)
+
+    return list(groups.values())
+
+# System parameters of a config as stored with results
+def configParams(config):
+    return {key: value for key, value in config.items() if key not in TEST_KEYS and key != "name"}
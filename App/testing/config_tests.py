@@ -1,17 +1,25 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import logging
-from testing.test_utils import Tester, Timer
+import math
+import threading
+import queue
+import time
+from testing.test_utils import Tester, Timer, QueryFeed, Histogram, LatencyStats, arrivalTimes
+from milvus.ground_truth import recallAtK
 from pathlib import Path
 
 execTester = Tester()
-queryTimer = Timer()
+
+LATENCY_SAMPLES = 1000 # Per query latencies kept in a query record, the histogram holds all queries
+SCHEDULE_BACKLOG = 4 # Scheduled queries waiting per open loop worker, bounds memory when the server is slower than the schedule
 
 log = logging.getLogger("_test_")
 
 path = str(Path(__file__).parent.parent)
 
 corpus_amazonReviews = {
+    "name" : "amazonReviews",
     "path" : path+"/data/corpus/amazonProductReviews.csv", 
     "format" : "CSV",
     "queries": ["I brave the mist and the fog", "Great Birthday present both for girls and boys", "cheerful", "Great Birthday present for children", "I brave the fog", "I bought this game for our 5-year-old twins",
@@ -19,6 +27,7 @@ corpus_amazonReviews = {
 }
 
 corpus_commonCrawl = {
+    "name" : "commonCrawl",
     "path" : path+"/data/corpus/commonCrawl.json",
     "format" : "JSON",
     "queries" : ["A polar bear chases a reindeer into the water","The new animated movie introduces the world to the mythology", "apple pie", "Solr", "A reindeer was chased into water", "The new animated film shows mythology",
@@ -26,6 +35,7 @@ corpus_commonCrawl = {
 }
 
 corpus_ccGigafida = {
+    "name" : "ccGigafida",
     "path" : path+"/data/corpus/ccGigafida.json",
     "format" : "JSON",
     "queries" : ["prenovljenem Frederikovem stolpu na Ljubljanskem gradu", "preko 80.000 ladij, katerih nosilnost je presegala 100 brutoregistrskih ton (BRT)", "strah in trepet", "Po sončnih pobočjih nad Kranjsko Goro",
@@ -33,27 +43,433 @@ corpus_ccGigafida = {
                   "Kranjska gora je sončna in ima veliko pobočji", "vakcina", "spakedrati", "1500", "7.30-12.00", "solr in milvus, sistema za informacijsko poizvedovanje", "samo žlabudrati zna", "omaloževati"]
 }
 
+CORPORA = {
+    "amazonReviews": corpus_amazonReviews,
+    "commonCrawl": corpus_commonCrawl,
+    "ccGigafida": corpus_ccGigafida,
+}
+
+# Result of a test phase with resource summary and series of the tester
+def _phaseResult(phase, **fields):
+    result = {"phase": phase}
+    result.update(fields)
+    result["resources"] = execTester.summary()
+    result["series"] = execTester.series()
+
+    return result
+
 def testIndex(instance, corpus, progress, use_partition = True):
+    # Compiling the corpus cache is done before the index phase, it is not index time
+    log.info("Preparing corpus: {}".format(corpus["path"]))
+    prepared = instance.prepareIndex(corpus["path"], corpus["format"], use_partition, corpus.get("cache", False))
+    # A streamed corpus counts its documents by parsing the file, the count is kept for the progress of the index phase
+    log.info("Corpus documents: {}".format(len(prepared)))
     log.info("Test index started:")
-    execTester.start()
+    execTester.start("index")
+    stats = None
     try:
-        instance.indexDocuments(corpus["path"], corpus["format"], progress, use_partition)
+        stats = instance.indexDocuments(corpus["path"], corpus["format"], progress, use_partition, corpus.get("cache", False), prepared)
     finally:
         execTester.stop()
         log.info("Test index ended: {}".format(execTester.info()))
 
+    # Documents indexed per second, Solr counts split parts of large texts as documents
+    stats = stats or {}
+    elapsed = execTester.summary()["execution_time"]
+    if(stats.get("documents") != None and elapsed > 0):
+        stats["throughput"] = stats["documents"] / elapsed
+        print("   indexed: {} docs throughput: {:.2f} docs/s".format(stats["documents"], stats["throughput"]))
+        log.info("    Indexed: {} Throughput: {} docs/s".format(stats["documents"], stats["throughput"]))
 
-def testQuery(instance, corpus, progress):
-    log.info("Test query started:")
-    execTester.start()
+    return _phaseResult("index", **stats)
+
+# Log and print percentile summary of a latency histogram
+def _reportLatency(label, histogram):
+    log.info("    {} latency: {}".format(label.capitalize(), histogram.info()))
+    if(histogram.count > 0):
+        print("   {} latency p50: {:.6f}s p95: {:.6f}s p99: {:.6f}s max: {:.6f}s".format(
+            label, histogram.percentile(50), histogram.percentile(95), histogram.percentile(99), histogram.maximum))
+
+# Run each query once, recording the end to end latency of every query and counting failed ones as errors.
+# Returns the latency of the first query
+def _sequentialQueries(instance, corpus, progress, query_latency, queryTimer):
+    first_query = None
     progress.setMax(len(corpus["queries"]))
     progress.start()
     try:
         for i, query in enumerate(corpus["queries"]):
-            instance.searchText(query, queryTimer)
+            time_start = time.perf_counter()
+            try:
+                instance.searchText(query, queryTimer)
+                latency = time.perf_counter() - time_start
+                query_latency.record(latency, query)
+                if(first_query == None):
+                    first_query = latency
+            except Exception as ex:
+                query_latency.errors += 1
+                log.exception("    " + str(ex))
             progress.print(i+1)
     finally:
         progress.end()
+
+    return first_query
+
+def testQuery(instance, corpus, progress, cache = None, samples = LATENCY_SAMPLES):
+    log.info("Test query started:")
+    query_latency = LatencyStats(samples)
+    search_latency = Histogram()
+    queryTimer = Timer(search_latency)
+    execTester.start("query")
+    try:
+        _sequentialQueries(instance, corpus, progress, query_latency, queryTimer)
+    finally:
         execTester.stop()
+        print("   queries: {} errors: {}".format(query_latency.count, query_latency.errors))
+        _reportLatency("query", query_latency)
+        _reportLatency("search", search_latency)
         log.info("Test query ended: {}".format(execTester.info()))
 
+    elapsed = execTester.summary()["execution_time"]
+
+    return _phaseResult("query", mode = "sequential", cache = cache, qps = query_latency.count / elapsed if elapsed > 0 else 0,
+                        query_latency = query_latency, search_latency = search_latency,
+                        latencies = query_latency.latencies, latencies_dropped = query_latency.dropped)
+
+# Cold start test, caches are emptied by reloading the core or collections and the first pass over the queries is measured
+def testColdStart(instance, corpus, progress, samples = LATENCY_SAMPLES):
+    log.info("Test cold start started:")
+    query_latency = LatencyStats(samples)
+    search_latency = Histogram()
+    queryTimer = Timer(search_latency)
+    execTester.start("cold")
+    try:
+        time_start = time.perf_counter()
+        instance.reload()
+        load_time = time.perf_counter() - time_start
+        first_query = _sequentialQueries(instance, corpus, progress, query_latency, queryTimer)
+    finally:
+        execTester.stop()
+
+    print("   reload time: {:.6f}s first query: {:.6f}s errors: {}".format(load_time, first_query if first_query != None else 0, query_latency.errors))
+    _reportLatency("cold query", query_latency)
+    _reportLatency("cold search", search_latency)
+    log.info("Test cold start ended: Reload time: {} First query: {} {}".format(load_time, first_query, execTester.info()))
+
+    return _phaseResult("cold", cache = "cold", load_time = load_time, first_query = first_query,
+                        query_latency = query_latency, search_latency = search_latency,
+                        latencies = query_latency.latencies, latencies_dropped = query_latency.dropped)
+
+# Run queries not included in the statistics, for a number of queries or seconds, to fill server caches before measuring
+def warmUp(instance, corpus, queries = None, seconds = None):
+    log.info("Warm-up started: queries {} seconds {}".format(queries, seconds))
+    if(seconds != None):
+        feed = QueryFeed(corpus["queries"], duration = seconds)
+    else:
+        feed = QueryFeed(corpus["queries"], repeat = math.ceil(queries / len(corpus["queries"])))
+
+    count = 0
+    time_start = time.perf_counter()
+    feed.start()
+    while(queries == None or count < queries):
+        query = feed.next()
+        if(query == None):
+            break
+        try:
+            instance.searchText(query)
+        except Exception as ex:
+            log.exception("    " + str(ex))
+        count += 1
+    feed.stop()
+    elapsed = time.perf_counter() - time_start
+
+    print("   warm-up queries: {} elapsed: {:.2f}s".format(count, elapsed))
+    log.info("Warm-up ended: Queries: {} Elapsed: {}".format(count, elapsed))
+
+    return {"queries": count, "elapsed": elapsed}
+
+# Run queries until the feed is exhausted, each worker uses its own timer
+def _queryWorker(instance, feed, stats, search_latency):
+    timer = Timer(search_latency)
+    while True:
+        query = feed.next()
+        if(query == None):
+            break
+
+        time_start = time.perf_counter()
+        try:
+            instance.searchText(query, timer)
+            stats.record(time.perf_counter() - time_start, query)
+        except Exception as ex:
+            stats.errors += 1
+            log.exception("    " + str(ex))
+
+# Closed loop test, concurrency workers run queries for a number of repeats or a duration in seconds
+def testQueryConcurrent(instance, corpus, progress, concurrency, repeat = 1, duration = None, cache = None, samples = LATENCY_SAMPLES):
+    log.info("Test concurrent query started: workers {} repeat {} duration {}".format(concurrency, repeat, duration))
+    feed = QueryFeed(corpus["queries"], repeat, duration)
+    worker_stats = [LatencyStats(samples) for _ in range(concurrency)]
+    worker_search_latency = [Histogram() for _ in range(concurrency)]
+    workers = [threading.Thread(target=_queryWorker, args=(instance, feed, worker_stats[w], worker_search_latency[w])) for w in range(concurrency)]
+
+    if(duration != None):
+        progress.setMax(int(duration))
+    else:
+        progress.setMax(len(corpus["queries"]) * repeat)
+
+    execTester.start("query")
+    progress.start()
+    time_start = time.perf_counter()
+    feed.start()
+    try:
+        for worker in workers:
+            worker.start()
+        # Wait for workers and refresh progress meanwhile
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(0.5)
+                if(duration != None):
+                    progress.print(min(int(time.perf_counter() - time_start), int(duration)))
+                else:
+                    progress.print(feed.issued)
+    finally:
+        feed.stop()
+        for worker in workers:
+            if(worker.is_alive()):
+                worker.join()
+        elapsed = time.perf_counter() - time_start
+        progress.end()
+        execTester.stop()
+
+        query_latency = LatencyStats(samples)
+        search_latency = Histogram()
+        for w in range(concurrency):
+            log.info("    Worker {}: {}".format(w+1, worker_stats[w].info()))
+            query_latency.merge(worker_stats[w])
+            search_latency.merge(worker_search_latency[w])
+        qps = query_latency.count / elapsed if elapsed > 0 else 0
+
+        print("   workers: {} queries: {} errors: {} QPS: {:.2f}".format(concurrency, query_latency.count, query_latency.errors, qps))
+        _reportLatency("query", query_latency)
+        _reportLatency("search", search_latency)
+        log.info("Test concurrent query ended: Queries: {} Errors: {} Elapsed: {} QPS: {} {}".format(query_latency.count, query_latency.errors, elapsed, qps, execTester.info()))
+
+    return _phaseResult("query", mode = "closed", cache = cache, workers = concurrency, repeat = repeat, duration = duration, qps = qps,
+                        query_latency = query_latency, search_latency = search_latency, worker_latency = worker_stats,
+                        latencies = query_latency.latencies, latencies_dropped = query_latency.dropped)
+
+
+# Take scheduled queries and measure latency from the scheduled send time
+def _openLoopWorker(instance, scheduled_queries, stats, search_latency):
+    timer = Timer(search_latency)
+    while True:
+        item = scheduled_queries.get()
+        if(item == None):
+            break
+
+        scheduled, query = item
+        try:
+            instance.searchText(query, timer)
+            stats.record(time.perf_counter() - scheduled, query)
+        except Exception as ex:
+            stats.errors += 1
+            log.exception("    " + str(ex))
+
+# Queue a scheduled query, waits while the bounded queue is full. Returns True when the query was queued late,
+# its latency still counts from the scheduled time, so a server slower than the schedule shows in the latency
+def _schedule(scheduled_queries, item):
+    try:
+        scheduled_queries.put_nowait(item)
+        return False
+    except queue.Full:
+        scheduled_queries.put(item)
+        return True
+
+# Send queries at a target rate for duration seconds, independently of the response times
+def _openLoopRate(instance, corpus, progress, rate, arrival, duration, workers, samples):
+    scheduled_queries = queue.Queue(maxsize = workers * SCHEDULE_BACKLOG)
+    worker_stats = [LatencyStats(samples) for _ in range(workers)]
+    worker_search_latency = [Histogram() for _ in range(workers)]
+    threads = [threading.Thread(target=_openLoopWorker, args=(instance, scheduled_queries, worker_stats[w], worker_search_latency[w])) for w in range(workers)]
+    feed = QueryFeed(corpus["queries"], duration = duration)
+
+    progress.setMax(int(duration))
+    progress.start()
+    for thread in threads:
+        thread.start()
+
+    time_start = time.perf_counter()
+    feed.start()
+    sent = 0
+    late = 0
+    second = 0
+    try:
+        for offset in arrivalTimes(rate, duration, arrival):
+            scheduled = time_start + offset
+            delay = scheduled - time.perf_counter()
+            if(delay > 0):
+                time.sleep(delay)
+
+            query = feed.next()
+            if(query == None):
+                break
+            late += _schedule(scheduled_queries, (scheduled, query))
+            sent += 1
+            if(int(offset) > second):
+                second = int(offset)
+                progress.print(second)
+    finally:
+        for _ in threads:
+            scheduled_queries.put(None)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - time_start
+        progress.print(int(duration))
+        progress.end()
+
+    query_latency = LatencyStats(samples)
+    search_latency = Histogram()
+    for w in range(workers):
+        query_latency.merge(worker_stats[w])
+        search_latency.merge(worker_search_latency[w])
+
+    return {
+        "rate": rate,
+        "sent": sent,
+        "late": late,
+        "completed": query_latency.count,
+        "errors": query_latency.errors,
+        "throughput": query_latency.count / elapsed if elapsed > 0 else 0,
+        "p50": query_latency.percentile(50),
+        "p99": query_latency.percentile(99),
+        "max": query_latency.maximum,
+        "query_latency": query_latency,
+        "search_latency": search_latency,
+    }
+
+# Open loop test, sweep arrival rates and report the highest throughput where p99 latency meets the slo in seconds
+def testQueryOpenLoop(instance, corpus, progress, rates, arrival = "constant", duration = 10, slo = None, workers = 32, cache = None, samples = LATENCY_SAMPLES):
+    log.info("Test open loop query started: rates {} arrival {} duration {} slo {} workers {}".format(rates, arrival, duration, slo, workers))
+    execTester.start("query")
+    results = []
+    sustained = None
+    try:
+        for rate in sorted(rates):
+            print("   rate: {} queries/s".format(rate))
+            result = _openLoopRate(instance, corpus, progress, rate, arrival, duration, workers, samples)
+            results.append(result)
+
+            breached = slo != None and (result["p99"] == None or result["p99"] > slo)
+            log.info("    Rate {} Sent: {} Late: {} Completed: {} Errors: {} Throughput: {} p50: {} p99: {} Max: {} SLO breached: {}".format(
+                rate, result["sent"], result["late"], result["completed"], result["errors"], result["throughput"], result["p50"], result["p99"], result["max"], breached))
+            print("   throughput: {:.2f}".format(result["throughput"]))
+            _reportLatency("query", result["query_latency"])
+            _reportLatency("search", result["search_latency"])
+
+            # Higher rates only add queueing once the slo is broken
+            if(breached):
+                break
+            sustained = result
+    finally:
+        execTester.stop()
+        if(sustained != None):
+            log.info("Test open loop query ended: Highest rate within SLO {} Throughput: {} p99: {} {}".format(sustained["rate"], sustained["throughput"], sustained["p99"], execTester.info()))
+            print("   highest rate within SLO: {} throughput: {:.2f}".format(sustained["rate"], sustained["throughput"]))
+        else:
+            log.info("Test open loop query ended: No rate within SLO {}".format(execTester.info()))
+            print("   no rate within SLO")
+
+    return _phaseResult("query", mode = "open", cache = cache, arrival = arrival, duration = duration, slo = slo, workers = workers,
+                        qps = sustained["throughput"] if sustained != None else None,
+                        sustained_rate = sustained["rate"] if sustained != None else None,
+                        query_latency = sustained["query_latency"] if sustained != None else None,
+                        latencies = sustained["query_latency"].latencies if sustained != None else [],
+                        latencies_dropped = sustained["query_latency"].dropped if sustained != None else 0,
+                        rates = results)
+
+# Recall@k of the approximate index against exact search over the embeddings stored at index time
+def testRecall(instance, corpus, progress, k):
+    log.info("Test recall started: k {}".format(k))
+    store = instance.embedding_store
+    if(not instance.store_embeddings or store.isEmpty()):
+        log.warning("    No stored embeddings, index the corpus with recall enabled first")
+        print("   no stored embeddings for recall, index the corpus with recall enabled first")
+        return None
+
+    search_latency = Histogram()
+    searchTimer = Timer(search_latency)
+    recalls = []
+    execTester.start("recall")
+    progress.setMax(len(corpus["queries"]))
+    progress.start()
+    try:
+        for i, query in enumerate(corpus["queries"]):
+            embedding, approximate_ids = instance.searchNeighbours(query, k, searchTimer)
+            exact_ids = store.search(embedding, k, instance.metric_type)[0]
+            recalls.append((query, recallAtK(approximate_ids, exact_ids)))
+            progress.print(i+1)
+    finally:
+        progress.end()
+        execTester.stop()
+
+    values = [recall for _, recall in recalls if recall != None]
+    recall = sum(values) / len(values) if values else None
+    if(recall != None):
+        print("   recall@{}: {:.4f}".format(k, recall))
+    _reportLatency("search", search_latency)
+    log.info("Test recall ended: Recall@{}: {} {}".format(k, recall, execTester.info()))
+
+    return _phaseResult("recall", k = k, recall = recall, recalls = recalls, search_latency = search_latency)
+
+# Replay a workload at the captured send times scaled by speed, latency is measured from the scheduled send time as in open loop tests
+def testQueryReplay(instance, corpus, progress, speed = 1, workers = 32, cache = None, samples = LATENCY_SAMPLES):
+    log.info("Test replay query started: workload {} speed {} workers {}".format(corpus["queries"], speed, workers))
+    scheduled_queries = queue.Queue(maxsize = workers * SCHEDULE_BACKLOG)
+    worker_stats = [LatencyStats(samples) for _ in range(workers)]
+    worker_search_latency = [Histogram() for _ in range(workers)]
+    threads = [threading.Thread(target=_openLoopWorker, args=(instance, scheduled_queries, worker_stats[w], worker_search_latency[w])) for w in range(workers)]
+
+    execTester.start("query")
+    progress.setMax(len(corpus["queries"]))
+    progress.start()
+    for thread in threads:
+        thread.start()
+
+    time_start = time.perf_counter()
+    sent = 0
+    late = 0
+    try:
+        for offset, query in corpus["queries"].replay(speed):
+            scheduled = time_start + offset
+            delay = scheduled - time.perf_counter()
+            if(delay > 0):
+                time.sleep(delay)
+
+            late += _schedule(scheduled_queries, (scheduled, query))
+            sent += 1
+            if(sent % 100 == 0):
+                progress.print(sent)
+    finally:
+        for _ in threads:
+            scheduled_queries.put(None)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - time_start
+        progress.print(sent)
+        progress.end()
+        execTester.stop()
+
+    query_latency = LatencyStats(samples)
+    search_latency = Histogram()
+    for w in range(workers):
+        query_latency.merge(worker_stats[w])
+        search_latency.merge(worker_search_latency[w])
+    qps = query_latency.count / elapsed if elapsed > 0 else 0
+
+    print("   sent: {} late: {} completed: {} errors: {} throughput: {:.2f}".format(sent, late, query_latency.count, query_latency.errors, qps))
+    _reportLatency("query", query_latency)
+    _reportLatency("search", search_latency)
+    log.info("Test replay query ended: Sent: {} Late: {} Completed: {} Errors: {} Elapsed: {} QPS: {} {}".format(sent, late, query_latency.count, query_latency.errors, elapsed, qps, execTester.info()))
+
+    return _phaseResult("query", mode = "replay", cache = cache, speed = speed, workers = workers, sent = sent, late = late, qps = qps,
+                        query_latency = query_latency, search_latency = search_latency,
+                        latencies = query_latency.latencies, latencies_dropped = query_latency.dropped)
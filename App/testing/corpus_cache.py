@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+from array import array
+from pathlib import Path
+from testing.corpus_reader import readCorpus, countDocuments
+
+LOG = logging.getLogger("_test_")
+
+path = str(Path(__file__).parent.parent)
+
+CACHE_PATH = path + "/data/cache/"
+HASH_CHUNK = 1 << 20 # Bytes of the source file hashed at once
+OFFSETS_FLUSH = 1 << 16 # Offsets buffered before they are written
+
+# Column of strings written as one UTF-8 blob and int64 offsets of the values, value i is blob[offsets[i]:offsets[i+1]]
+class _ColumnWriter():
+    def __init__(self, file):
+        self.blob = open(file + ".bin", 'wb')
+        self.index = open(file + ".idx", 'wb')
+        self.offset = 0
+        self.offsets = array("q", [0])
+
+    def add(self, value):
+        data = value.encode("utf-8")
+        self.blob.write(data)
+        self.offset += len(data)
+        self.offsets.append(self.offset)
+        if(len(self.offsets) >= OFFSETS_FLUSH):
+            self._flush()
+
+    def _flush(self):
+        self.index.write(self.offsets.tobytes())
+        self.offsets = array("q")
+
+    def close(self):
+        self._flush()
+        self.blob.close()
+        self.index.close()
+
+def _map(file):
+    with open(file, 'rb') as mapped_file:
+        if(os.fstat(mapped_file.fileno()).st_size == 0):
+            return b""
+        return mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+# Memory mapped column, values are decoded from the mapped blob without reading the file
+class _Column():
+    def __init__(self, file):
+        self.blob = memoryview(_map(file + ".bin"))
+        self.offsets = memoryview(_map(file + ".idx")).cast("q")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i+1]], "utf-8")
+
+# Int64 offsets of the first sentence of every document
+def _mapOffsets(file):
+    return memoryview(_map(file)).cast("q")
+
+# Corpus compiled to memory mapped columns of titles and texts, and per tokenizer settings columns of the sentence chunks
+class CompiledCorpus():
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), 'r', encoding='utf-8') as meta_file:
+            self.meta = json.load(meta_file)
+        self.titles = _Column(os.path.join(directory, "titles"))
+        self.texts = _Column(os.path.join(directory, "texts"))
+
+    def __len__(self):
+        return len(self.titles)
+
+    def documents(self):
+        for i in range(len(self)):
+            yield self.titles[i], self.texts[i]
+
+    def _sentencesFile(self, settings):
+        key = hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+        return os.path.join(self.directory, "sentences_" + key)
+
+    # Compile the sentences split by tokenize(text) once for each settings key
+    def compileSentences(self, settings, tokenize):
+        file = self._sentencesFile(settings)
+        if(not os.path.exists(file + ".docs")):
+            LOG.info("    Compiling sentences of {} with {}".format(self.meta["source"], settings))
+            writer = _ColumnWriter(file + ".tmp")
+            with open(file + ".tmp.docs", 'wb') as docs_file:
+                docs = array("q", [0])
+                count = 0
+                for i in range(len(self)):
+                    for sentence in tokenize(self.texts[i]):
+                        writer.add(sentence)
+                        count += 1
+                    docs.append(count)
+                    if(len(docs) >= OFFSETS_FLUSH):
+                        docs_file.write(docs.tobytes())
+                        docs = array("q")
+                docs_file.write(docs.tobytes())
+            writer.close()
+            os.replace(file + ".tmp.bin", file + ".bin")
+            os.replace(file + ".tmp.idx", file + ".idx")
+            os.replace(file + ".tmp.docs", file + ".docs")
+
+        return file
+
+    # Documents with their sentences split by tokenize(text) as ((title, text), sentences), sentences are compiled when missing
+    def tokenized(self, settings, tokenize):
+        file = self.compileSentences(settings, tokenize)
+        column = _Column(file)
+        docs = _mapOffsets(file + ".docs")
+        for i in range(len(self)):
+            yield (self.titles[i], self.texts[i]), [column[s] for s in range(docs[i], docs[i+1])]
+
+# Corpus read from the source file, with the interface of a compiled corpus
+class StreamedCorpus():
+    def __init__(self, file, format):
+        self.file = file
+        self.format = format
+        self.count = None
+
+    def __len__(self):
+        if(self.count == None):
+            self.count = countDocuments(self.file, self.format)
+
+        return self.count
+
+    def documents(self):
+        return readCorpus(self.file, self.format)
+
+    def compileSentences(self, settings, tokenize):
+        return None
+
+    def tokenized(self, settings, tokenize):
+        for title, text in self.documents():
+            yield (title, text), tokenize(text)
+
+def fileHash(file):
+    digest = hashlib.sha256()
+    with open(file, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+# Hash of the source file, stored with its size and modification time in the cache directory.
+# The file is hashed again only when its size or modification time changed
+def sourceHash(file, name, directory = CACHE_PATH):
+    stat = os.stat(file)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    signature_file = os.path.join(directory, name + ".source.json")
+    try:
+        with open(signature_file, 'r', encoding='utf-8') as source_file:
+            stored = json.load(source_file)
+        if(stored.get("size") == signature["size"] and stored.get("mtime_ns") == signature["mtime_ns"]):
+            return stored["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    signature["sha256"] = fileHash(file)
+    os.makedirs(directory, exist_ok=True)
+    with open(signature_file + ".tmp", 'w', encoding='utf-8') as source_file:
+        json.dump(signature, source_file)
+    os.replace(signature_file + ".tmp", signature_file)
+
+    return signature["sha256"]
+
+# Compile a corpus once, later calls map the compiled columns. The cache is keyed by the hash of the source file,
+# caches of older versions of the file are removed
+def compileCorpus(file, format, directory = CACHE_PATH):
+    # Name by the file and its path, so only older versions of the same file share the name
+    name = "{}-{}".format(os.path.basename(file).replace(".", "_"), hashlib.sha1(os.path.abspath(file).encode("utf-8")).hexdigest()[:8])
+    source_hash = sourceHash(file, name, directory)
+    compiled = os.path.join(directory, "{}-{}".format(name, source_hash[:16]))
+    if(os.path.exists(os.path.join(compiled, "meta.json"))):
+        return CompiledCorpus(compiled)
+
+    for stale in glob.glob(os.path.join(directory, name + "-*")):
+        LOG.info("    Removing stale corpus cache {}".format(stale))
+        shutil.rmtree(stale, ignore_errors=True)
+
+    LOG.info("    Compiling corpus {} to {}".format(file, compiled))
+    temporary = compiled + ".tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    titles = _ColumnWriter(os.path.join(temporary, "titles"))
+    texts = _ColumnWriter(os.path.join(temporary, "texts"))
+    count = 0
+    for title, text in readCorpus(file, format):
+        titles.add(title)
+        texts.add(text)
+        count += 1
+    titles.close()
+    texts.close()
+    with open(os.path.join(temporary, "meta.json"), 'w', encoding='utf-8') as meta_file:
+        json.dump({"source": file, "format": format, "sha256": source_hash, "documents": count}, meta_file)
+    os.replace(temporary, compiled)
+
+    return CompiledCorpus(compiled)
+
+# Compiled corpus when caching is enabled, otherwise the corpus streamed from its file
+def openCorpus(file, format, cache = False):
+    if(cache):
+        return compileCorpus(file, format)
+
+    return StreamedCorpus(file, format)
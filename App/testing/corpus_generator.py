@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import csv
+import json
+import string
+import numpy as np
+
+from testing.batching import LUCENE_LIMIT
+
+LENGTH_DISTRIBUTIONS = ("lognormal", "uniform", "fixed")
+BATCH_DOCS = 10000 # Documents generated at once, bounds memory of the generator
+SENTENCE_WORDS = (5, 20) # Words per sentence, sentences start with a capital and end with a period as the Milvus tokenizer expects
+
+# Synthetic corpus of (title, text) documents. Word frequencies follow Zipf's law over a synthetic or given vocabulary,
+# document lengths in words follow the selected distribution and a share of documents is made larger than the Lucene term limit
+class CorpusGenerator():
+    def __init__(self, docs, mean_words = 200, distribution = "lognormal", sigma = 1.0, vocabulary = 50000, zipf = 1.1,
+                 vocabulary_file = None, oversized = 0.0, seed = None):
+        if(distribution not in LENGTH_DISTRIBUTIONS):
+            raise ValueError("Unknown length distribution {}, use one of {}".format(distribution, LENGTH_DISTRIBUTIONS))
+        self.docs = docs
+        self.mean_words = mean_words
+        self.distribution = distribution
+        self.sigma = sigma
+        self.oversized = oversized
+        self.rng = np.random.default_rng(seed)
+
+        if(vocabulary_file != None):
+            with open(vocabulary_file, 'r', encoding='utf-8') as words_file:
+                words = [line.strip() for line in words_file if line.strip()]
+        else:
+            words = self._syntheticWords(vocabulary)
+        self.words = np.array(words, dtype=object)
+
+        # Zipf probabilities by rank, the first words of the vocabulary are the most frequent
+        weights = 1.0 / np.arange(1, len(self.words) + 1) ** zipf
+        probabilities = weights / weights.sum()
+        self.cumulative = np.cumsum(probabilities)
+        word_bytes = np.array([len(word.encode("utf-8")) + 1 for word in words])
+        self.average_word_bytes = float((word_bytes * probabilities).sum())
+
+    # Unique lowercase words of 2 to 12 letters
+    def _syntheticWords(self, size):
+        letters = np.array(list(string.ascii_lowercase))
+        words = []
+        seen = set()
+        while len(words) < size:
+            for length in self.rng.integers(2, 13, size - len(words)):
+                word = "".join(self.rng.choice(letters, length))
+                if(word not in seen):
+                    seen.add(word)
+                    words.append(word)
+
+        return words
+
+    # Document lengths in words, at least one word
+    def _lengths(self, count):
+        if(self.distribution == "lognormal"):
+            # Median chosen so the mean of the distribution is mean_words
+            lengths = self.rng.lognormal(np.log(self.mean_words) - self.sigma ** 2 / 2, self.sigma, count)
+        elif(self.distribution == "uniform"):
+            lengths = self.rng.uniform(1, 2 * self.mean_words, count)
+        else:
+            lengths = np.full(count, self.mean_words)
+
+        return np.maximum(lengths.astype(np.int64), 1)
+
+    # Words drawn by inverse transform sampling of the cumulative Zipf probabilities
+    def _words(self, count):
+        ids = np.searchsorted(self.cumulative, self.rng.random(count) * self.cumulative[-1], side="right")
+
+        return self.words[np.minimum(ids, len(self.words) - 1)]
+
+    def _sentences(self, words):
+        sentences = []
+        start = 0
+        for length in self.rng.integers(SENTENCE_WORDS[0], SENTENCE_WORDS[1] + 1, len(words) // SENTENCE_WORDS[0] + 1):
+            sentence = words[start:start+length]
+            if(len(sentence) == 0):
+                break
+            sentences.append(" ".join(sentence).capitalize() + ".")
+            start += length
+
+        return " ".join(sentences)
+
+    # Oversized texts are 1.2 to 4 times the Lucene term limit, they are extended until they pass it
+    def _oversizedText(self):
+        target = int(LUCENE_LIMIT * self.rng.uniform(1.2, 4))
+        text = self._sentences(self._words(int(target / self.average_word_bytes)))
+        while len(text.encode("utf-8")) <= LUCENE_LIMIT:
+            text += " " + self._sentences(self._words(SENTENCE_WORDS[1]))
+
+        return text
+
+    # Yield (title, text) of every document, titles are unique as JSON corpora use them as keys
+    def documents(self):
+        for batch_start in range(0, self.docs, BATCH_DOCS):
+            count = min(BATCH_DOCS, self.docs - batch_start)
+            lengths = self._lengths(count)
+            oversized = self.rng.random(count) < self.oversized
+            title_lengths = self.rng.integers(2, 8, count)
+            # Words of the whole batch are drawn at once and sliced per document
+            lengths[oversized] = 0
+            title_ends = np.cumsum(title_lengths)
+            text_ends = np.cumsum(lengths)
+            title_words = self._words(int(title_ends[-1]))
+            text_words = self._words(int(text_ends[-1]))
+            for i in range(count):
+                title = "{} {}".format(" ".join(title_words[title_ends[i]-title_lengths[i]:title_ends[i]]).capitalize(), batch_start + i + 1)
+                text = self._oversizedText() if oversized[i] else self._sentences(text_words[text_ends[i]-lengths[i]:text_ends[i]])
+                yield title, text
+
+    # Stream documents to a CSV file with title and text columns or a JSON object of title keys and text values
+    def write(self, file, format, progress = None):
+        if(progress != None):
+            progress.setMax(self.docs)
+            progress.start()
+
+        with open(file, 'w', encoding='utf-8', newline='') as corpus_file:
+            if(format == "CSV"):
+                writer = csv.writer(corpus_file)
+                writer.writerow(["title", "text"])
+            else:
+                corpus_file.write("{")
+
+            for i, (title, text) in enumerate(self.documents()):
+                if(format == "CSV"):
+                    writer.writerow([title, text])
+                else:
+                    corpus_file.write("{}\n{}: {}".format("," if i > 0 else "", json.dumps(title, ensure_ascii=False), json.dumps(text, ensure_ascii=False)))
+                if(progress != None and (i+1) % BATCH_DOCS == 0):
+                    progress.print(i+1)
+
+            if(format != "CSV"):
+                corpus_file.write("\n}\n")
+
+        if(progress != None):
+            progress.print(self.docs)
+            progress.end()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import csv
+import json
+
+CHUNK_CHARS = 1 << 20 # Characters read from a JSON corpus at once
+WHITESPACE = " \t\n\r"
+
+# Corpora can have texts larger than the default csv field limit of 128 kB
+csv.field_size_limit(1 << 30)
+
+# Read (title, text) of CSV rows one at a time, the file is read in buffered chunks by the csv module
+def _readCSV(file):
+    with open(file, 'r', encoding='utf-8', newline='') as corpus_file:
+        reader = csv.DictReader(corpus_file)
+        for row in reader:
+            yield row["title"] or "", row["text"] or ""
+
+# Incremental parser of the top level JSON object {title: text, ...}, only one chunk and the current member are in memory
+class _JSONObjectReader():
+    def __init__(self, corpus_file, chunk_chars = CHUNK_CHARS):
+        self.file = corpus_file
+        self.chunk_chars = chunk_chars
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    # Read the next chunk, keeping the unparsed rest of the buffer
+    def _fill(self):
+        chunk = self.file.read(self.chunk_chars)
+        if(chunk == ""):
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+        return True
+
+    # Next non whitespace character, without consuming it
+    def _peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if(self.position < len(self.buffer)):
+                return self.buffer[self.position]
+            if(not self._fill()):
+                return None
+
+    def _expect(self, characters):
+        character = self._peek()
+        if(character == None or character not in characters):
+            raise ValueError("Expected {} at position {} of the JSON corpus, found {}".format(" or ".join(characters), self.position, character))
+        self.position += 1
+
+        return character
+
+    # Decode the next value, reading chunks until the value is complete. A value ending at the buffer end
+    # could be a cut number or literal, so it is decoded again with more data
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if(end < len(self.buffer) or self.eof):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if(self.eof):
+                    raise
+            self._fill()
+
+    def members(self):
+        self._expect("{")
+        if(self._peek() == "}"):
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            value = self._value()
+            yield key, value
+            if(self._expect(",}") == "}"):
+                return
+
+def _readJSON(file):
+    with open(file, 'r', encoding='utf-8') as corpus_file:
+        for title, text in _JSONObjectReader(corpus_file).members():
+            yield title, text
+
+# Documents of a CSV corpus with title and text columns or a JSON corpus object of title keys and text values,
+# read lazily as (title, text) so corpora larger than memory can be indexed
+def readCorpus(file, format):
+    if(format == "CSV"):
+        return _readCSV(file)
+    elif(format == "JSON"):
+        return _readJSON(file)
+
+    raise ValueError("Unknown corpus format {}, use CSV or JSON".format(format))
+
+# Number of documents, counted by streaming the corpus once
+def countDocuments(file, format):
+    return sum(1 for _ in readCorpus(file, format))
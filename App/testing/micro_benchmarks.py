@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import http.server
+import json
+import random
+import socket
+import threading
+import time
+import tracemalloc
+
+from solr.solr import partitionText
+from testing.batching import LUCENE_LIMIT
+from solr.lib.pysolr import (Solr as SolrClient, BytesJSONDecoder, StreamBody, REPLACEMENTS, force_bytes, force_unicode, orjson)
+
+# Alphabets of 1 to 4 byte UTF-8 characters, texts mix them to put character boundaries at every byte offset
+ALPHABETS = {
+    "ascii": "abcdefghijklmnopqrstuvwxyz",
+    "latin": "abcčdefghijklmnoprsštuvzž",
+    "cjk": "的一是不了人我在有他这中大来上国个到说们",
+    "emoji": "\U0001F600\U0001F601\U0001F602\U0001F923\U0001F60D\U0001F680",
+}
+WHITESPACE = " \n\t"
+
+# Text of about size UTF-8 bytes, words of the alphabet separated by whitespace or one word without whitespace
+def syntheticText(size, alphabet = "latin", spaces = True, seed = None):
+    rng = random.Random(seed)
+    characters = ALPHABETS[alphabet] if alphabet != "mixed" else "".join(ALPHABETS.values())
+    words = []
+    length = 0
+    while length < size:
+        word = "".join(rng.choices(characters, k=rng.randint(1, 12)))
+        words.append(word)
+        length += len(word.encode("utf-8")) + 1
+    if(not spaces):
+        return "".join(words)
+
+    return "".join(word + rng.choice(WHITESPACE) for word in words)
+
+# Previous splitter of oversized Solr documents, character by character with a backwards scan for whitespace.
+# Kept as the baseline of the benchmark
+def legacyPartition(string, max):
+    def findLastWhiteSpace(string, iFrom, iTo):
+        i = iFrom
+        while i > iTo:
+            if(string[i].isspace()):
+                return i
+            i-=1
+
+        return 0
+
+    splits = []
+    all_count = len(bytes(string.encode("utf-8")))
+    byte_count = 0
+    iFrom = 0
+    i = 0
+    while i < len(string):
+        c = string[i]
+        byte_char_count = len(bytes(c.encode("utf-8")))
+        if(byte_count+byte_char_count >= max):
+            byte_count = 0
+            last_space = findLastWhiteSpace(string, i, iFrom)
+            if(last_space > 0):
+                splits.append((iFrom, last_space))
+                i = last_space
+                iFrom = last_space
+            else:
+                splits.append((iFrom, i))
+                iFrom = i
+        byte_count += byte_char_count
+        i += 1
+    splits.append((iFrom, all_count+1))
+
+    return [string[start:end] for start, end in splits]
+
+# Check that parts of texts in every alphabet, with and without whitespace, join to the text and stay under the limit.
+# Limits smaller than the Lucene limit cut more often, so character boundaries are hit at every offset. Returns checked parts
+def checkPartition(limits = (5, 7, 64, 1000, LUCENE_LIMIT), size = 200000, seed = 1):
+    checked = 0
+    for limit in limits:
+        for alphabet in list(ALPHABETS) + ["mixed"]:
+            for spaces in (True, False):
+                text = syntheticText(size if limit >= 1000 else size // 100, alphabet, spaces, seed)
+                parts = partitionText(text, limit)
+                if("".join(parts) != text):
+                    raise AssertionError("Parts of a {} text with limit {} do not join to the text".format(alphabet, limit))
+                for i, part in enumerate(parts):
+                    size_bytes = len(part.encode("utf-8"))
+                    if(size_bytes >= limit):
+                        raise AssertionError("Part {} of a {} text has {} bytes, limit is {}".format(i, alphabet, size_bytes, limit))
+                    if(size_bytes == 0 and len(parts) > 1):
+                        raise AssertionError("Part {} of a {} text with limit {} is empty".format(i, alphabet, limit))
+                    # Parts are cut at whitespace when the part has whitespace before the limit
+                    if(spaces and i > 0 and limit >= 64 and part[0] not in WHITESPACE):
+                        raise AssertionError("Part {} of a {} text with limit {} is not cut at whitespace".format(i, alphabet, limit))
+                checked += len(parts)
+
+    return checked
+
+def _timeSplit(split, text, repeat):
+    times = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        parts = split(text)
+        times.append(time.perf_counter() - time_start)
+
+    return min(times), len(parts)
+
+# Best time of splitting multi megabyte documents to Lucene limit parts, with the legacy splitter as baseline when enabled
+def benchmarkPartition(sizes_mb = (1, 4, 16), repeat = 3, legacy = True, seed = 1):
+    results = []
+    for size_mb in sizes_mb:
+        for alphabet, spaces in (("latin", True), ("latin", False), ("mixed", True)):
+            text = syntheticText(int(size_mb * 1e6), alphabet, spaces, seed)
+            seconds, parts = _timeSplit(lambda text: partitionText(text, LUCENE_LIMIT), text, repeat)
+            result = {"benchmark": "split", "size_mb": size_mb, "input": "{}{}".format(alphabet, "" if spaces else " no spaces"),
+                      "items": parts, "seconds": seconds, "mb_per_s": size_mb / seconds if seconds > 0 else None, "legacy_seconds": None}
+            if(legacy):
+                result["legacy_seconds"], _ = _timeSplit(lambda text: legacyPartition(text, LUCENE_LIMIT), text, 1)
+            results.append(result)
+
+    return results
+
+# Previous add() serialization: the cleaned docs encoded to one string, encoded to bytes, 29 replace passes
+# of sanitize over bytes, decoded to a string and encoded again before sending
+def legacySerialize(client, docs):
+    message = client.encoder.encode([client._build_json_doc(doc) for doc in docs]).encode("utf-8")
+    fixed_string = force_bytes(message)
+    for bad, good in REPLACEMENTS:
+        fixed_string = fixed_string.replace(bad, good)
+
+    return force_bytes(force_unicode(fixed_string))
+
+# Chunks of the streamed add() body, consumed one at a time as the HTTP layer sends them
+def streamSerialize(client, docs):
+    size = 0
+    for chunk in StreamBody(lambda: client._json_docs_chunks(docs, clean_ctrl_chars=True)):
+        size += len(chunk)
+
+    return size
+
+# Time and peak traced memory of the serialization of a batch, the documents are allocated before tracing
+def _traceSerialize(serialize, docs, repeat):
+    times = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        serialize(docs)
+        times.append(time.perf_counter() - time_start)
+    tracemalloc.start()
+    serialize(docs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(times), peak / 1e6
+
+# Serialization of batches of Lucene limit sized documents to the JSON update body, streamed against the legacy path
+def benchmarkSerialize(sizes_mb = (1, 4, 16), repeat = 3, legacy = True, seed = 1):
+    client = SolrClient("http://localhost:8983/solr/benchmark")
+    text = syntheticText(LUCENE_LIMIT - 100, "latin", True, seed)
+    results = []
+    for size_mb in sizes_mb:
+        count = max(int(size_mb * 1e6 / LUCENE_LIMIT), 1)
+        docs = [{"id": i, "title": "Document {}".format(i), "text": text} for i in range(count)]
+        seconds, peak = _traceSerialize(lambda docs: streamSerialize(client, docs), docs, repeat)
+        result = {"benchmark": "serialize", "size_mb": size_mb, "input": "JSON docs of {} bytes".format(LUCENE_LIMIT - 100),
+                  "items": count, "seconds": seconds, "mb_per_s": size_mb / seconds if seconds > 0 else None, "peak_mb": peak,
+                  "legacy_seconds": None, "legacy_peak_mb": None}
+        if(legacy):
+            result["legacy_seconds"], result["legacy_peak_mb"] = _traceSerialize(lambda docs: legacySerialize(client, docs), docs, repeat)
+        results.append(result)
+
+    return results
+
+# Solr JSON select response of rows documents as received, with only ids and titles or also stored texts of text_bytes
+def solrResponse(rows, text_bytes = 0, seed = 1):
+    rng = random.Random(seed)
+    text = syntheticText(text_bytes, "mixed", True, seed) if text_bytes > 0 else None
+    docs = []
+    for i in range(rows):
+        doc = {"id": str(i), "title": syntheticText(40, "latin", True, seed + i).strip(), "score": rng.random() * 20}
+        if(text != None):
+            doc["text"] = [text]
+        docs.append(doc)
+    response = {"responseHeader": {"status": 0, "QTime": rng.randint(1, 50), "params": {"q": "title:\"benchmark query\"", "fl": "id,title,score",
+                "rows": str(rows), "wt": "json"}}, "response": {"numFound": rows * 37, "start": 0, "maxScore": 20.0, "docs": docs}}
+
+    return json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+# Pages of the decode benchmark, (description, response bytes)
+def _decodePages(sizes_mb, seed):
+    pages = [("{} rows id,title".format(rows), solrResponse(rows, 0, seed)) for rows in (10, 100, 1000)]
+    for size_mb in sizes_mb:
+        rows = 100
+        pages.append(("{} rows with texts".format(rows), solrResponse(rows, int(size_mb * 1e6 / rows), seed)))
+
+    return pages
+
+def _decodeBackends():
+    return ("orjson", "json") if orjson != None else ("json",)
+
+# Check that every backend decodes responses, bytes and strings, NaN floats and escapes as the json module. Returns checked documents
+def checkDecode(seed = 1):
+    checked = 0
+    pages = [page for _, page in _decodePages((0.01,), seed)]
+    pages.append(b'{"response": {"numFound": 1, "maxScore": NaN, "docs": [{"id": "a\\u0001\\"b", "title": "\xc4\x8d\xf0\x9f\x98\x80"}]}}')
+    for backend in _decodeBackends():
+        decoder = BytesJSONDecoder(backend)
+        for page in pages:
+            expected = json.JSONDecoder().decode(force_unicode(page))
+            for data in (page, force_unicode(page)):
+                decoded = decoder.decode(data)
+                if(json.dumps(decoded, sort_keys=True) != json.dumps(expected, sort_keys=True)):
+                    raise AssertionError("Backend {} decodes a response of {} bytes differently than json".format(backend, len(page)))
+            checked += len(expected["response"]["docs"])
+
+    return checked
+
+# Best time of one decode, small responses are decoded in a loop of about a MB so the timer resolution does not matter
+def _timeDecode(decode, data, repeat):
+    loops = max(1, (1 << 20) // len(data))
+    times = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        for _ in range(loops):
+            decode(data)
+        times.append((time.perf_counter() - time_start) / loops)
+
+    return min(times)
+
+# Decode time of Solr result pages from the received bytes by each installed backend, with the previous
+# decoding to a string and decoding it with json.JSONDecoder as baseline when enabled
+def benchmarkDecode(sizes_mb = (1, 4, 16), repeat = 3, legacy = True, seed = 1):
+    legacy_decoder = json.JSONDecoder()
+    results = []
+    for description, page in _decodePages(sizes_mb, seed):
+        size_mb = len(page) / 1e6
+        legacy_seconds = _timeDecode(lambda data: legacy_decoder.decode(force_unicode(data)), page, repeat) if legacy else None
+        for backend in _decodeBackends():
+            decoder = BytesJSONDecoder(backend)
+            seconds = _timeDecode(decoder.decode, page, repeat)
+            results.append({"benchmark": "decode", "size_mb": round(size_mb, 3), "input": "{} {}".format(backend, description),
+                            "items": len(page), "seconds": seconds, "mb_per_s": size_mb / seconds if seconds > 0 else None,
+                            "legacy_seconds": legacy_seconds})
+
+    return results
+
+# Local Solr update handler, reads the request body, plain or chunked, and answers with an empty Solr response
+class _UpdateHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Jetty writes without Nagle delays, so does the local server
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        if(self.headers.get("Transfer-Encoding", "").lower() == "chunked"):
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                self.rfile.read(size + 2)
+                if(size == 0):
+                    break
+        else:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"responseHeader":{"status":0,"QTime":0}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+# Time of sending the update body of a batch over a kept alive connection to a local server
+def _timeSend(client, docs, body, repeat):
+    times = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        client._update(body(docs), clean_ctrl_chars=False, solrapi="JSON", commit=False)
+        times.append(time.perf_counter() - time_start)
+
+    return min(times)
+
+# Update requests of batches of small documents sent to a local server, streamed in chunks of 64 KiB and in a
+# chunk per document, with the previous whole body as baseline. Measures the writes the encode only benchmark leaves out
+def benchmarkSend(sizes_mb = (1, 4, 16), repeat = 3, legacy = True, seed = 1, doc_bytes = 1000):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _UpdateHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = SolrClient("http://127.0.0.1:{}/solr/benchmark".format(server.server_port))
+    text = syntheticText(doc_bytes, "latin", True, seed)
+    bodies = (("streamed 64 KiB chunks", lambda docs: StreamBody(lambda: client._json_docs_chunks(docs, clean_ctrl_chars=True))),
+              ("streamed chunk per doc", lambda docs: StreamBody(lambda: client._json_docs_chunks(docs, clean_ctrl_chars=True), 1)))
+    results = []
+    try:
+        for size_mb in sizes_mb:
+            count = max(int(size_mb * 1e6 / doc_bytes), 1)
+            docs = [{"id": i, "title": "Document {}".format(i), "text": text} for i in range(count)]
+            legacy_seconds = _timeSend(client, docs, lambda docs: legacySerialize(client, docs), repeat) if legacy else None
+            for description, body in bodies:
+                seconds = _timeSend(client, docs, body, repeat)
+                results.append({"benchmark": "send", "size_mb": size_mb, "input": "{} of {} byte docs".format(description, doc_bytes),
+                                "items": count, "seconds": seconds, "mb_per_s": size_mb / seconds if seconds > 0 else None,
+                                "legacy_seconds": legacy_seconds})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return results
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import threading
+import os
+from datetime import datetime
+from pathlib import Path
+from testing.test_utils import LatencyStats
+
+path = str(Path(__file__).parent.parent)
+
+RESULTS_PATH = path + "/results/results.jsonl"
+
+# Append only store of test results, one JSON record per test phase
+class ResultStore():
+    def __init__(self, file = RESULTS_PATH):
+        self.file = file
+        self.lock = threading.Lock()
+
+    # Histograms and other objects with toDict are stored in their serializable form
+    def _encode(self, value):
+        if(hasattr(value, "toDict")):
+            return value.toDict()
+
+        return str(value)
+
+    def write(self, run, result):
+        record = {"timestamp": datetime.now().isoformat()}
+        record.update(run)
+        record.update(result)
+        line = json.dumps(record, default=self._encode, ensure_ascii=False)
+
+        with self.lock:
+            directory = os.path.dirname(self.file)
+            if(directory and not os.path.exists(directory)):
+                os.makedirs(directory)
+            with open(self.file, 'a', encoding='utf-8') as results_file:
+                results_file.write(line + "\n")
+
+    # Stream records, optionally only of the given runs
+    def read(self, run_ids = None):
+        if(not os.path.exists(self.file)):
+            return
+        with open(self.file, 'r', encoding='utf-8') as results_file:
+            for line in results_file:
+                if(line.strip()):
+                    record = json.loads(line)
+                    if(run_ids == None or record["run_id"] in run_ids):
+                        yield record
+
+    def runIds(self):
+        run_ids = []
+        for record in self.read():
+            if(record["run_id"] not in run_ids):
+                run_ids.append(record["run_id"])
+
+        return run_ids
+
+# Identifier of a test run, records of all phases and iterations share it
+def newRunId(system, config):
+    return "{}-{}-{}".format(datetime.now().strftime("%Y%m%d-%H%M%S"), system, str(config).lower().replace(" ", "-"))
+
+# Aggregate metrics of a run, latency histograms of all iterations are merged
+def _runMetrics(records):
+    metrics = {"index_time": [], "index_throughput": [], "qps": [], "recall": [], "reload_time": [], "first_query": []}
+    query_latency = None
+    cold_latency = None
+    cache_hits = 0
+    cache_lookups = 0
+    for record in records:
+        execution_time = (record.get("resources") or {}).get("execution_time")
+        if(record["phase"] == "index" and execution_time != None):
+            metrics["index_time"].append(execution_time)
+        if(record["phase"] == "index" and record.get("throughput") != None):
+            metrics["index_throughput"].append(record["throughput"])
+        if(record["phase"] == "query"):
+            if(record.get("qps") != None):
+                metrics["qps"].append(record["qps"])
+            if(record.get("query_latency") != None):
+                latency = LatencyStats.fromDict(record["query_latency"])
+                query_latency = latency if query_latency == None else query_latency.merge(latency)
+            if(record.get("result_cache") != None):
+                cache_hits += record["result_cache"]["hits"]
+                cache_lookups += record["result_cache"]["hits"] + record["result_cache"]["misses"]
+        if(record["phase"] == "recall" and record.get("recall") != None):
+            metrics["recall"].append(record["recall"])
+        if(record["phase"] == "cold"):
+            metrics["reload_time"].append(record["load_time"])
+            if(record.get("first_query") != None):
+                metrics["first_query"].append(record["first_query"] * 1000)
+            latency = LatencyStats.fromDict(record["query_latency"])
+            cold_latency = latency if cold_latency == None else cold_latency.merge(latency)
+
+    result = {key: sum(values) / len(values) if values else None for key, values in metrics.items()}
+    result["p50"] = query_latency.percentile(50) * 1000 if query_latency != None and query_latency.count > 0 else None
+    result["p99"] = query_latency.percentile(99) * 1000 if query_latency != None and query_latency.count > 0 else None
+    result["cache_hit_rate"] = cache_hits / cache_lookups * 100 if cache_lookups > 0 else None
+    result["cold_p50"] = cold_latency.percentile(50) * 1000 if cold_latency != None and cold_latency.count > 0 else None
+
+    return result
+
+def _formatDelta(value, baseline):
+    if(value == None):
+        return "-"
+    if(baseline == None or baseline == 0):
+        return "{:.3f}".format(value)
+
+    return "{:.3f} ({:+.1f}%)".format(value, (value - baseline) / baseline * 100)
+
+COMPARE_COLUMNS = (
+    ("index_time", "Index time (s)"),
+    ("index_throughput", "Index docs/s"),
+    ("qps", "QPS"),
+    ("p50", "p50 (ms)"),
+    ("p99", "p99 (ms)"),
+    ("recall", "Recall@k"),
+    ("reload_time", "Cold reload (s)"),
+    ("first_query", "Cold first query (ms)"),
+    ("cold_p50", "Cold p50 (ms)"),
+    ("cache_hit_rate", "Cache hit %"),
+)
+
+# Markdown table of runs, deltas are relative to the first run
+def compareRuns(store, run_ids):
+    runs = {run_id: [] for run_id in run_ids}
+    for record in store.read(set(run_ids)):
+        runs[record["run_id"]].append(record)
+
+    header = "| Run | System | Config | " + " | ".join(title for _, title in COMPARE_COLUMNS) + " |"
+    lines = [header, "|" + " --- |" * (3 + len(COMPARE_COLUMNS))]
+    baseline = None
+    for run_id in run_ids:
+        records = runs[run_id]
+        if(len(records) == 0):
+            lines.append("| {} | not found |".format(run_id) + " |" * (1 + len(COMPARE_COLUMNS)))
+            continue
+
+        metrics = _runMetrics(records)
+        if(baseline == None):
+            baseline = metrics
+        values = [_formatDelta(metrics[key], baseline[key] if metrics is not baseline else None) for key, _ in COMPARE_COLUMNS]
+        lines.append("| {} | {} | {} | {} |".format(run_id, records[0]["system"], records[0]["config"], " | ".join(values)))
+
+    return "\n".join(lines)
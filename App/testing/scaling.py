@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import csv
+import json
+import math
+import os
+import numpy as np
+from pathlib import Path
+from testing.corpus_reader import readCorpus, countDocuments
+
+path = str(Path(__file__).parent.parent)
+
+FRACTIONS_PATH = path + "/data/corpus/fractions/"
+
+# Metrics of a scaling step fitted against the number of documents
+SCALING_METRICS = (
+    ("index_time", "Index time (s)"),
+    ("index_size", "Index size (MB)"),
+    ("p50", "p50 (ms)"),
+    ("p99", "p99 (ms)"),
+    ("client_memory", "Client memory (MB)"),
+    ("server_memory", "Server memory (MB)"),
+)
+
+# Corpus of the first fraction of documents, written once next to the corpora in the same format
+def corpusFraction(corpus, fraction, total = None, directory = FRACTIONS_PATH):
+    total = total if total != None else countDocuments(corpus["path"], corpus["format"])
+    documents = max(int(total * fraction), 1)
+    part = dict(corpus)
+    part["documents"] = documents
+    if(documents >= total):
+        return part
+
+    name, extension = os.path.splitext(os.path.basename(corpus["path"]))
+    part["path"] = os.path.join(directory, "{}_{}{}".format(name, documents, extension))
+    part["name"] = "{} {:g}%".format(corpus.get("name", name), fraction * 100)
+    if(os.path.exists(part["path"]) and os.path.getmtime(part["path"]) >= os.path.getmtime(corpus["path"])):
+        return part
+
+    if(not os.path.exists(directory)):
+        os.makedirs(directory)
+    with open(part["path"], 'w', encoding='utf-8', newline='') as part_file:
+        if(corpus["format"] == "CSV"):
+            writer = csv.writer(part_file)
+            writer.writerow(["title", "text"])
+        else:
+            part_file.write("{")
+        for i, (title, text) in enumerate(readCorpus(corpus["path"], corpus["format"])):
+            if(i >= documents):
+                break
+            if(corpus["format"] == "CSV"):
+                writer.writerow([title, text])
+            else:
+                part_file.write("{}\n{}: {}".format("," if i > 0 else "", json.dumps(title, ensure_ascii=False), json.dumps(text, ensure_ascii=False)))
+        if(corpus["format"] != "CSV"):
+            part_file.write("\n}\n")
+
+    return part
+
+# Metrics of one corpus fraction from its index and query results
+def scalingStep(fraction, documents, index_result, query_result, index_size):
+    def memory(result, key):
+        resources = result.get("resources") or {}
+        client = (resources.get("client") or {}).get("rss_max_bytes")
+        servers = [server.get("memory_max_bytes") for server in (resources.get("servers") or {}).values()]
+        servers = [value for value in servers if value != None]
+        if(key == "client"):
+            return client / 1e6 if client != None else None
+
+        return sum(servers) / 1e6 if servers else None
+
+    latency = query_result.get("query_latency")
+    has_latency = latency != None and latency.count > 0
+    client_memory = [value for value in (memory(index_result, "client"), memory(query_result, "client")) if value != None]
+    server_memory = [value for value in (memory(index_result, "server"), memory(query_result, "server")) if value != None]
+
+    return {
+        "fraction": fraction,
+        "documents": documents,
+        "index_time": (index_result.get("resources") or {}).get("execution_time"),
+        "index_size": index_size / 1e6 if index_size != None else None,
+        "p50": latency.percentile(50) * 1000 if has_latency else None,
+        "p99": latency.percentile(99) * 1000 if has_latency else None,
+        "client_memory": max(client_memory) if client_memory else None,
+        "server_memory": max(server_memory) if server_memory else None,
+    }
+
+# Least squares fit of a power law y = a * x^b in log space. The exponent b is the growth trend,
+# 0 is constant, 1 is linear growth with the corpus size, below 1 sublinear and above 1 superlinear
+def fitGrowth(sizes, values):
+    points = [(x, y) for x, y in zip(sizes, values) if x != None and y != None and x > 0 and y > 0]
+    if(len(points) < 2):
+        return None
+    log_x = np.log([x for x, _ in points])
+    log_y = np.log([y for _, y in points])
+    exponent, intercept = np.polyfit(log_x, log_y, 1)
+    residuals = log_y - (exponent * log_x + intercept)
+    total = ((log_y - log_y.mean()) ** 2).sum()
+    r2 = 1 - (residuals ** 2).sum() / total if total > 0 else 1.0
+
+    return {"coefficient": math.exp(intercept), "exponent": float(exponent), "r2": float(r2)}
+
+def _growth(exponent):
+    if(abs(exponent) < 0.1):
+        return "constant"
+    if(exponent < 0.9):
+        return "sublinear"
+    if(exponent > 1.1):
+        return "superlinear"
+
+    return "linear"
+
+# Fits of every metric and a markdown table of the steps with the fitted exponents
+def scalingReport(steps):
+    sizes = [step["documents"] for step in steps]
+    fits = {key: fitGrowth(sizes, [step[key] for step in steps]) for key, _ in SCALING_METRICS}
+
+    lines = ["| Fraction | Documents | " + " | ".join(title for _, title in SCALING_METRICS) + " |", "|" + " --- |" * (2 + len(SCALING_METRICS))]
+    for step in steps:
+        values = ["{:.3f}".format(step[key]) if step[key] != None else "-" for key, _ in SCALING_METRICS]
+        lines.append("| {:g}% | {} | {} |".format(step["fraction"] * 100, step["documents"], " | ".join(values)))
+    trend = ["x^{:.2f} {} (R2 {:.2f})".format(fits[key]["exponent"], _growth(fits[key]["exponent"]), fits[key]["r2"]) if fits[key] != None else "-" for key, _ in SCALING_METRICS]
+    lines.append("| Growth | | {} |".format(" | ".join(trend)))
+
+    return fits, "\n".join(lines)
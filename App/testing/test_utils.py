@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import sys
+import os
 import time
 import threading
+import subprocess
+import logging
 import psutil
 import math
+import random
+
+LOG = logging.getLogger("_test_")
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+PROC_ROOT = "/proc"
 
 class Progress():
     def __init__(self,width):
@@ -41,15 +50,18 @@ class Progress():
         sys.stdout.flush()
 
 class Timer():
-    def __init__(self):
+    def __init__(self, histogram = None):
         self.time_start = None
         self.time_stop = None
+        self.histogram = histogram
 
     def start(self):
         self.time_start = time.perf_counter()
 
     def stop(self):
         self.time_stop = time.perf_counter()
+        if(self.histogram != None and self.time_start != None):
+            self.histogram.record(self.time_stop - self.time_start)
 
     def info(self):
         if(self.time_start != None and self.time_stop != None):
@@ -62,48 +74,519 @@ class Timer():
 
         return None
 
-class Tester():
-    def __init__(self):
+# Thread safe source of queries shared by concurrent query workers
+class QueryFeed():
+    def __init__(self, queries, repeat = 1, duration = None):
+        self.queries = queries
+        self.repeat = repeat
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.iterator = None
+        self.deadline = None
+        self.passes = 0
+        self.issued = 0
+        self.running = False
+
+    def start(self):
+        self.iterator = iter(self.queries)
+        self.passes = 0
+        self.issued = 0
+        self.running = True
+        if(self.duration != None):
+            self.deadline = time.perf_counter() + self.duration
+
+    def stop(self):
+        self.running = False
+
+    # Next query or None when the repeat count or duration is reached
+    def next(self):
+        with self.lock:
+            if(not self.running):
+                return None
+            if(self.deadline != None and time.perf_counter() >= self.deadline):
+                self.running = False
+                return None
+
+            query = next(self.iterator, None)
+            if(query == None):
+                self.passes += 1
+                # With a duration queries are repeated until the deadline
+                if(self.duration == None and self.passes >= self.repeat):
+                    self.running = False
+                    return None
+                self.iterator = iter(self.queries)
+                query = next(self.iterator, None)
+                if(query == None):
+                    self.running = False
+                    return None
+
+            self.issued += 1
+
+            return query
+
+# Send times of an open loop test with constant or poisson arrivals, relative to test start
+def arrivalTimes(rate, duration, arrival = "constant", seed = None):
+    generator = random.Random(seed)
+    scheduled = 0
+    while True:
+        if(arrival == "poisson"):
+            scheduled += generator.expovariate(rate)
+        else:
+            scheduled += 1 / rate
+        if(scheduled >= duration):
+            break
+
+        yield scheduled
+
+# Latency histogram with log linear buckets like HdrHistogram.
+# Values are counted in units, each power of two range is split in 2^precision buckets,
+# which keeps the relative error below 1/2^precision. Histograms with the same unit and precision can be merged.
+class Histogram():
+    PERCENTILES = (50, 90, 95, 99, 99.9)
+
+    def __init__(self, unit = 1e-6, precision = 7, max_value = 3600):
+        self.unit = unit
+        self.precision = precision
+        self.max_index = self._index(int(max_value / unit))
+        self.counts = [0] * (self.max_index + 1)
         self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+
+    def _index(self, units):
+        shift = units.bit_length() - self.precision - 1
+        if(shift <= 0):
+            return units
+
+        return (shift << self.precision) + (units >> shift)
+
+    # Highest value counted in a bucket
+    def _value(self, index):
+        if(index < 2 << self.precision):
+            return index
+        shift = (index >> self.precision) - 1
+        lowest = (index - (shift << self.precision)) << shift
+
+        return lowest + (1 << shift) - 1
+
+    def record(self, value):
+        index = self._index(int(value / self.unit))
+        self.counts[index if index < self.max_index else self.max_index] += 1
+        self.count += 1
+        self.total += value
+        if(self.minimum == None or value < self.minimum):
+            self.minimum = value
+        if(self.maximum == None or value > self.maximum):
+            self.maximum = value
+
+    def merge(self, other):
+        if(self.unit != other.unit or self.precision != other.precision):
+            raise ValueError("Histograms with different unit or precision can not be merged")
+        if(len(other.counts) > len(self.counts)):
+            self.counts += [0] * (len(other.counts) - len(self.counts))
+            self.max_index = other.max_index
+        for index, count in enumerate(other.counts):
+            if(count):
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if(other.minimum != None and (self.minimum == None or other.minimum < self.minimum)):
+            self.minimum = other.minimum
+        if(other.maximum != None and (self.maximum == None or other.maximum > self.maximum)):
+            self.maximum = other.maximum
+
+        return self
+
+    def mean(self):
+        if(self.count > 0):
+            return self.total / self.count
+
+        return None
+
+    def percentile(self, procent):
+        if(self.count == 0):
+            return None
+        rank = max(math.ceil(procent / 100 * self.count), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if(seen >= rank):
+                # Values above max_value are all counted in the last bucket
+                if(index == self.max_index):
+                    return self.maximum
+                value = self._value(index) * self.unit
+
+                return min(max(value, self.minimum), self.maximum)
+
+        return self.maximum
+
+    def summary(self):
+        summary = {"count": self.count, "min": self.minimum, "mean": self.mean()}
+        for procent in self.PERCENTILES:
+            summary["p{}".format(procent).replace(".", "")] = self.percentile(procent)
+        summary["max"] = self.maximum
+
+        return summary
+
+    def info(self):
+        return " ".join("{}: {}".format(key, value) for key, value in self.summary().items())
+
+    # Serializable form with the summary and the non empty buckets
+    def toDict(self):
+        return {
+            "summary": self.summary(),
+            "unit": self.unit,
+            "precision": self.precision,
+            "total": self.total,
+            "counts": [[index, count] for index, count in enumerate(self.counts) if count],
+        }
+
+    @classmethod
+    def fromDict(cls, data):
+        histogram = cls.__new__(cls)
+        Histogram.__init__(histogram, data["unit"], data["precision"])
+        for index, count in data["counts"]:
+            histogram.counts[min(index, histogram.max_index)] += count
+        histogram.count = data["summary"]["count"]
+        histogram.total = data["total"]
+        histogram.minimum = data["summary"]["min"]
+        histogram.maximum = data["summary"]["max"]
+
+        return histogram
+
+# Latency histogram of a query worker with errors and the first samples (query, latency) pairs, later pairs are only counted as dropped
+# so records of large workloads stay bounded
+class LatencyStats(Histogram):
+    def __init__(self, samples = 0):
+        super().__init__()
+        self.errors = 0
+        self.samples = samples
+        self.latencies = []
+        self.dropped = 0
+
+    def record(self, value, query = None):
+        super().record(value)
+        if(query != None):
+            self._keep((query, value))
+
+    def _keep(self, sample):
+        if(len(self.latencies) < self.samples):
+            self.latencies.append(sample)
+        else:
+            self.dropped += 1
+
+    def merge(self, other):
+        super().merge(other)
+        self.errors += getattr(other, "errors", 0)
+        for sample in getattr(other, "latencies", []):
+            self._keep(sample)
+        self.dropped += getattr(other, "dropped", 0)
+
+        return self
+
+    def toDict(self):
+        data = super().toDict()
+        data["errors"] = self.errors
+
+        return data
+
+    @classmethod
+    def fromDict(cls, data):
+        histogram = super().fromDict(data)
+        histogram.errors = data.get("errors", 0)
+        # Samples are stored next to the histogram in records, a loaded histogram keeps none
+        histogram.samples = 0
+        histogram.latencies = []
+        histogram.dropped = 0
+
+        return histogram
+
+    def info(self):
+        return "errors: {} {}".format(self.errors, super().info())
+
+# Samples cgroup counters of a container or process from the host, works with cgroup v2 and v1 layouts.
+# Samplers are pluggable, Tester accepts any object with a name and a sample method returning a dict of counters.
+class CgroupSampler():
+    def __init__(self, name, cgroups, pid = None, cgroup_root = CGROUP_ROOT, proc_root = PROC_ROOT):
+        self.name = name
+        # Cgroup path by controller, unified v2 hierarchy has an empty controller name
+        self.cgroups = cgroups
+        self.pid = pid
+        self.cgroup_root = cgroup_root
+        self.proc_root = proc_root
+
+    # Sampler for a process, cgroup paths are read from /proc/<pid>/cgroup
+    @classmethod
+    def fromPid(cls, pid, name = None, cgroup_root = CGROUP_ROOT, proc_root = PROC_ROOT):
+        cgroups = {}
+        with open(os.path.join(proc_root, str(pid), "cgroup")) as cgroup_file:
+            for line in cgroup_file:
+                _, controllers, path = line.strip().split(":", 2)
+                for controller in controllers.split(","):
+                    cgroups[controller] = path
+
+        return cls(name or str(pid), cgroups, pid, cgroup_root, proc_root)
+
+    # Sampler for a docker container by name, None if the container can't be resolved
+    @classmethod
+    def fromContainer(cls, name, cgroup_root = CGROUP_ROOT, proc_root = PROC_ROOT):
+        try:
+            inspect = subprocess.run(["docker", "inspect", "--format", "{{.State.Pid}}", name], capture_output=True, text=True, timeout=10)
+            pid = int(inspect.stdout.strip())
+            if(inspect.returncode != 0 or pid == 0):
+                raise ValueError("container {} is not running".format(name))
+
+            return cls.fromPid(pid, name, cgroup_root, proc_root)
+        except Exception as ex:
+            LOG.warning("    Server sampling of {} disabled: {}".format(name, ex))
+
+            return None
+
+    def _path(self, controller, file):
+        if(controller in self.cgroups):
+            return os.path.join(self.cgroup_root, controller, self.cgroups[controller].lstrip("/"), file)
+
+        return os.path.join(self.cgroup_root, self.cgroups.get("", "/").lstrip("/"), file)
+
+    def _read(self, controller, file):
+        try:
+            with open(self._path(controller, file)) as cgroup_file:
+                return cgroup_file.read()
+        except OSError:
+            return None
+
+    def _cpuSeconds(self):
+        stat = self._read("", "cpu.stat")
+        if(stat != None and "cpuacct" not in self.cgroups):
+            for line in stat.splitlines():
+                key, value = line.split()
+                if(key == "usage_usec"):
+                    return int(value) / 1e6
+        usage = self._read("cpuacct", "cpuacct.usage")
+        if(usage != None):
+            return int(usage) / 1e9
+
+        return None
+
+    def _memoryBytes(self):
+        current = self._read("", "memory.current") if "memory" not in self.cgroups else None
+        if(current == None):
+            current = self._read("memory", "memory.usage_in_bytes")
+        if(current != None):
+            return int(current)
+
+        return None
+
+    def _ioBytes(self):
+        read_bytes = write_bytes = None
+        stat = self._read("", "io.stat") if "blkio" not in self.cgroups else None
+        if(stat != None):
+            read_bytes = write_bytes = 0
+            for line in stat.splitlines():
+                for field in line.split()[1:]:
+                    key, value = field.split("=")
+                    if(key == "rbytes"):
+                        read_bytes += int(value)
+                    elif(key == "wbytes"):
+                        write_bytes += int(value)
+        else:
+            stat = self._read("blkio", "blkio.throttle.io_service_bytes")
+            if(stat != None):
+                read_bytes = write_bytes = 0
+                for line in stat.splitlines():
+                    fields = line.split()
+                    if(len(fields) == 3 and fields[1] == "Read"):
+                        read_bytes += int(fields[2])
+                    elif(len(fields) == 3 and fields[1] == "Write"):
+                        write_bytes += int(fields[2])
+
+        return read_bytes, write_bytes
+
+    # Network counters of the process namespace, loopback excluded
+    def _netBytes(self):
+        if(self.pid == None):
+            return None, None
+        try:
+            with open(os.path.join(self.proc_root, str(self.pid), "net", "dev")) as dev_file:
+                rx_bytes = tx_bytes = 0
+                for line in dev_file.readlines()[2:]:
+                    interface, counters = line.split(":", 1)
+                    if(interface.strip() == "lo"):
+                        continue
+                    counters = counters.split()
+                    rx_bytes += int(counters[0])
+                    tx_bytes += int(counters[8])
+
+                return rx_bytes, tx_bytes
+        except OSError:
+            return None, None
+
+    def sample(self):
+        io_read, io_write = self._ioBytes()
+        net_rx, net_tx = self._netBytes()
+
+        return {
+            "cpu_seconds": self._cpuSeconds(),
+            "memory_bytes": self._memoryBytes(),
+            "io_read_bytes": io_read,
+            "io_write_bytes": io_write,
+            "net_rx_bytes": net_rx,
+            "net_tx_bytes": net_tx,
+        }
+
+    # Summary of a series of (timestamp, sample) tuples
+    @staticmethod
+    def summary(series):
+        if(len(series) < 2):
+            return {}
+        (time_first, first), (time_last, last) = series[0], series[-1]
+        elapsed = time_last - time_first
+
+        def delta(key):
+            if(first.get(key) == None or last.get(key) == None):
+                return None
+            return last[key] - first[key]
+
+        cpu_seconds = delta("cpu_seconds")
+        memory = [sample["memory_bytes"] for _, sample in series if sample.get("memory_bytes") != None]
+
+        return {
+            "cpu_percent": cpu_seconds / elapsed * 100 if cpu_seconds != None and elapsed > 0 else None,
+            "memory_max_bytes": max(memory) if memory else None,
+            "memory_avg_bytes": sum(memory) / len(memory) if memory else None,
+            "io_read_bytes": delta("io_read_bytes"),
+            "io_write_bytes": delta("io_write_bytes"),
+            "net_rx_bytes": delta("net_rx_bytes"),
+            "net_tx_bytes": delta("net_tx_bytes"),
+        }
+
+# Samples the client process and server samplers every interval seconds during a test phase
+class Tester():
+    def __init__(self, samplers = None, interval = 0.05):
+        self.interval = interval
         self.running = False
+        self.stopping = threading.Event()
         self.time_start = None
         self.time_stop = None 
-        self.cpu_percent_sum = None
-        self.memory_percent_sum = None
         self.thread = None
+        self.process = None
+        self.samplers = samplers or []
+        self.phase = None
+        self.client_series = []
+        self.server_series = {}
+
+    def addSampler(self, sampler):
+        self.samplers.append(sampler)
+
+    # Client samples hold cumulative counters, rates are derived from differences between samples
+    def _sampleClient(self):
+        timestamp = time.time()
+        with self.process.oneshot():
+            cpu_times = self.process.cpu_times()
+            memory = self.process.memory_info()
+            ctx_switches = self.process.num_ctx_switches()
+            try:
+                io_counters = self.process.io_counters()
+                io_read, io_write = io_counters.read_bytes, io_counters.write_bytes
+            except (AttributeError, psutil.AccessDenied):
+                # Not available on macOS
+                io_read = io_write = None
+
+            self.client_series.append((timestamp, {
+                "cpu_seconds": cpu_times.user + cpu_times.system,
+                "rss_bytes": memory.rss,
+                "memory_percent": self.process.memory_percent(),
+                "threads": self.process.num_threads(),
+                "ctx_switches": ctx_switches.voluntary + ctx_switches.involuntary,
+                "io_read_bytes": io_read,
+                "io_write_bytes": io_write,
+            }))
+
+    # Server samples are timestamped with wall time so series line up with the phase start and stop
+    def _sampleServers(self):
+        timestamp = time.time()
+        for sampler in self.samplers:
+            self.server_series[sampler.name].append((timestamp, sampler.sample()))
 
     def _do(self):
-        self.cpu_percent_sum = 0
-        self.memory_percent_sum = 0
-        self.count = 0
-        self.running = True
-        currentProcess = psutil.Process()
-
-        while self.running:
-            cpu_curent =  currentProcess.cpu_percent(interval=1)
-            self.cpu_percent_sum += cpu_curent
-            memory_curent = currentProcess.memory_percent()
-            self.memory_percent_sum += memory_curent
-            self.count += 1
+        while not self.stopping.wait(self.interval):
+            self._sampleClient()
+            self._sampleServers()
     
-    def start(self):
+    def start(self, phase = None):
+        self.phase = phase
+        self.process = psutil.Process()
+        self.client_series = []
+        self.server_series = {sampler.name: [] for sampler in self.samplers}
+        self.stopping.clear()
+        self.running = True
         self.time_start = time.perf_counter()
+        self.time_stop = None
+        # First and last samples are taken in start and stop, so even short phases get a difference
+        self._sampleClient()
+        self._sampleServers()
         self.thread =  threading.Thread(target=self._do)
         self.thread.start()
        
     def stop(self):
-        self.running = False
+        self.stopping.set()
         self.thread.join()
+        self.running = False
         self.time_stop  =  time.perf_counter()
+        self._sampleClient()
+        self._sampleServers()
+
+    # Raw timestamped samples of the last phase
+    def series(self):
+        return {"client": self.client_series, "servers": self.server_series}
+
+    def _clientSummary(self):
+        (time_first, first), (time_last, last) = self.client_series[0], self.client_series[-1]
+        elapsed = time_last - time_first
+        samples = [sample for _, sample in self.client_series]
+
+        def delta(key):
+            if(first[key] == None or last[key] == None):
+                return None
+            return last[key] - first[key]
+
+        return {
+            "samples": len(samples),
+            "cpu_percent": delta("cpu_seconds") / elapsed * 100 if elapsed > 0 else None,
+            "rss_max_bytes": max(sample["rss_bytes"] for sample in samples),
+            "rss_avg_bytes": sum(sample["rss_bytes"] for sample in samples) / len(samples),
+            "memory_percent_avg": sum(sample["memory_percent"] for sample in samples) / len(samples),
+            "threads_max": max(sample["threads"] for sample in samples),
+            "ctx_switches": delta("ctx_switches"),
+            "io_read_bytes": delta("io_read_bytes"),
+            "io_write_bytes": delta("io_write_bytes"),
+        }
+
+    # Summary of server samples by sampler name
+    def serverInfo(self):
+        return {name: CgroupSampler.summary(series) for name, series in self.server_series.items()}
+
+    def summary(self):
+        if(self.running or self.time_stop == None):
+            return None
+
+        return {
+            "phase": self.phase,
+            "execution_time": self.time_stop - self.time_start,
+            "client": self._clientSummary(),
+            "servers": self.serverInfo(),
+        }
     
     def info(self):
-        if(not self.running and self.time_stop != None):
-            execution_time = self.time_stop - self.time_start
-            if(self.count   > 0):
-             
-                cpu_percent_avg = self.cpu_percent_sum / self.count  
-                memory_percent_avg = self.memory_percent_sum / self.count  
-        
-            return "Execution time: {} Averge CPU percentage: {}% Average memory utilization percentage: {}%".format(execution_time, cpu_percent_avg, memory_percent_avg )
+        summary = self.summary()
+        if(summary != None):
+            client = summary["client"]
+            info = "Execution time: {} Averge CPU percentage: {}% Average memory utilization percentage: {}%".format(summary["execution_time"], client["cpu_percent"], client["memory_percent_avg"])
+            info += " Client: {}".format(" ".join("{}: {}".format(key, value) for key, value in client.items()))
+            for name, server in summary["servers"].items():
+                info += " Server {}: {}".format(name, " ".join("{}: {}".format(key, value) for key, value in server.items()))
+
+            return info
             
-        return None
\ No newline at end of file
+        return None
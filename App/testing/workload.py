@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+from datetime import datetime
+
+# Query workload read from a file, one query per line or JSONL records {"query": ..., "timestamp": ...}.
+# The file is streamed on every pass, so large workloads are not held in memory. Iterating yields the query strings,
+# replay yields them with send offsets from captured timestamps
+class Workload():
+    def __init__(self, file):
+        self.file = file
+        self.jsonl = file.endswith(".jsonl")
+        self.count = None
+
+    def _records(self):
+        with open(self.file, 'r', encoding='utf-8') as workload_file:
+            for line in workload_file:
+                line = line.rstrip("\r\n")
+                if(not line.strip()):
+                    continue
+                if(self.jsonl):
+                    record = json.loads(line)
+                    yield record["query"], record.get("timestamp")
+                else:
+                    yield line, None
+
+    def __iter__(self):
+        for query, _ in self._records():
+            yield query
+
+    # Number of queries, counted by one pass over the file
+    def __len__(self):
+        if(self.count == None):
+            self.count = sum(1 for _ in self._records())
+
+        return self.count
+
+    # Timestamps are seconds or ISO 8601 strings
+    def _seconds(self, timestamp):
+        if(isinstance(timestamp, str)):
+            return datetime.fromisoformat(timestamp).timestamp()
+
+        return float(timestamp)
+
+    # Yield (offset, query) with offsets in seconds from the first query, divided by speed. Speed 2 replays twice as fast
+    def replay(self, speed = 1):
+        first = None
+        for i, (query, timestamp) in enumerate(self._records()):
+            if(timestamp == None):
+                raise ValueError("Query {} of {} has no timestamp, replay requires a JSONL workload with timestamps".format(i+1, self.file))
+            seconds = self._seconds(timestamp)
+            if(first == None):
+                first = seconds
+            yield max(seconds - first, 0) / speed, query
+
+    def __repr__(self):
+        return "Workload({})".format(self.file)
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from testing.test_utils import LatencyStats
+
+# Stats loaded from records merge like the ones recorded by query workers
+def test_merge_loaded_stats():
+    recorded = LatencyStats(samples = 2)
+    for i, latency in enumerate([0.01, 0.02, 0.03]):
+        recorded.record(latency, "query {}".format(i))
+    recorded.errors = 1
+
+    first = LatencyStats.fromDict(recorded.toDict())
+    second = LatencyStats.fromDict(recorded.toDict())
+    merged = first.merge(second)
+
+    assert merged.count == 6
+    assert merged.errors == 2
+    assert merged.latencies == []
+    assert merged.dropped == 0
+    assert abs(merged.percentile(50) - 0.02) < 0.001